@@ -1,5 +1,17 @@
 import re
-import requests
+import http_client
+import metadata_cache
+import metrics
+
+ITUNES_LOOKUP_URL = "https://itunes.apple.com/lookup"
+# the lookup endpoint accepts a comma-separated id list; keep URLs well under limits
+DEFAULT_CHUNK_SIZE = 100
+
+
+def set_lookup_url(url: str):
+    """Points lookups at a mirror or a local fake store (benchmarks)."""
+    global ITUNES_LOOKUP_URL
+    ITUNES_LOOKUP_URL = url
 
 def normalize_track_id(track_id) -> str:
     if track_id is None:
@@ -13,20 +25,89 @@ def normalize_track_id(track_id) -> str:
     return s
 
 def parse_apple(track_id: str, country="us", lang="en"):
-    url = "https://itunes.apple.com/lookup"
+    url = ITUNES_LOOKUP_URL
     tid = normalize_track_id(track_id)
     if not tid:
         raise ValueError(f"Invalid Apple track_id: {track_id}")
 
+    cached = metadata_cache.load("apple", tid, country, lang)
+    if cached:
+        return cached
+
     params = {"id": tid, "country": country, "lang": lang}
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    data = r.json()
+    try:
+        r = http_client.get(url, params=params)
+        r.raise_for_status()
+        data = r.json()
+    except Exception as e:
+        stale = metadata_cache.load_stale("apple", tid, country, lang)
+        if stale:
+            print(f"Apple lookup failed, using cached data: {tid}: {e}")
+            return stale
+        raise
 
     if data.get("resultCount", 0) < 1:
         raise ValueError(f"Apple app not found for track_id={tid}")
 
-    return data["results"][0]
+    result = data["results"][0]
+    metadata_cache.save("apple", tid, result, country, lang)
+    return result
+
+def parse_apple_batch(track_ids, country="us", lang="en", chunk_size=DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Resolves many track ids with one lookup request per chunk_size ids.
+    Returns {trackId: result}; ids that were not found (or whose chunk failed)
+    are left out and reported one by one. Fresh metadata_cache entries are
+    used as-is and never hit the network.
+    """
+    tids = []
+    seen = set()
+    for track_id in track_ids:
+        tid = normalize_track_id(track_id)
+        if tid and tid not in seen:
+            seen.add(tid)
+            tids.append(tid)
+
+    results = {}
+    misses = []
+    for tid in tids:
+        cached = metadata_cache.load("apple", tid, country, lang)
+        if cached:
+            results[tid] = cached
+        else:
+            misses.append(tid)
+
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(misses), chunk_size):
+        chunk = misses[start:start + chunk_size]
+        params = {"id": ",".join(chunk), "country": country, "lang": lang}
+        try:
+            r = http_client.get(ITUNES_LOOKUP_URL, params=params)
+            r.raise_for_status()
+            data = r.json()
+        except Exception as e:
+            for tid in chunk:
+                stale = metadata_cache.load_stale("apple", tid, country, lang)
+                if stale:
+                    print(f"Apple lookup failed, using cached data: {tid}: {e}")
+                    results[tid] = stale
+                else:
+                    metrics.incr("apple.failed")
+                    print(f"Apple parse failed: {tid}: {e}")
+            continue
+
+        for a in data.get("results") or []:
+            tid = str(a.get("trackId", "") or "")
+            if tid in seen:
+                results[tid] = a
+                metadata_cache.save("apple", tid, a, country, lang)
+
+        for tid in chunk:
+            if tid not in results:
+                metrics.incr("apple.failed")
+                print(f"Apple parse failed: {tid}: Apple app not found for track_id={tid}")
+
+    return results
 
 def apple_to_row(a: dict) -> dict:
     apple_id = str(a.get("trackId", "") or "")
@@ -59,5 +140,6 @@ def apple_to_row(a: dict) -> dict:
         "url": a.get("trackViewUrl", "") or "",
         "icon": icon,
         "screenshots": shots,
+        "updated": a.get("currentVersionReleaseDate", "") or "",
     }
 
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import http_client
+import metrics
+
+# Content-addressed store for icons/screenshots.
+#   .cache/assets/blobs/<aa>/<sha256>   - one copy of every distinct image
+#   .cache/assets/urls/<sha256(url)>.json - source url, ETag, Last-Modified, content hash
+# Files under apps_content/ are hardlinks to blobs (copies where links are not
+# supported), so identical images shared by several apps are stored once, and an
+# already known url is materialized without any request.
+
+CACHE_DIR = Path(".cache") / "assets"
+MANIFEST_NAME = "assets.json"
+
+MAX_BYTES = 10 * 1024 * 1024   # per asset; full-size Play screenshots are a few MB
+CHUNK_SIZE = 64 * 1024
+ALLOWED_CONTENT_TYPES = ("image/", "application/octet-stream")
+
+_config = {
+    "cache_dir": CACHE_DIR,
+    "revalidate": False,
+    "max_bytes": MAX_BYTES,
+}
+_lock = threading.Lock()
+
+
+def configure(cache_dir=None, revalidate=None, max_bytes=None):
+    """
+    revalidate=True sends a conditional request even for already known urls.
+    max_bytes caps a single download (0 = no limit).
+    """
+    with _lock:
+        if cache_dir is not None:
+            _config["cache_dir"] = Path(cache_dir)
+        if revalidate is not None:
+            _config["revalidate"] = bool(revalidate)
+        if max_bytes is not None:
+            _config["max_bytes"] = max(0, int(max_bytes))
+
+
+def revalidating() -> bool:
+    return _config["revalidate"]
+
+
+def blob_path(digest: str) -> Path:
+    return _config["cache_dir"] / "blobs" / digest[:2] / digest
+
+
+def url_record_path(url: str) -> Path:
+    name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return _config["cache_dir"] / "urls" / f"{name}.json"
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _tmp_sibling(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def check_content_type(url: str, headers):
+    content_type = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(ALLOWED_CONTENT_TYPES):
+        raise ValueError(f"Unexpected Content-Type {content_type!r} for {url}")
+
+
+class BlobWriter:
+    """
+    Incrementally writes one download into the blob store, hashing on the fly.
+    Oversized or truncated bodies raise from write()/commit(); abort() removes the temp file.
+    """
+
+    def __init__(self, url: str, headers):
+        self.url = url
+        self.max_bytes = _config["max_bytes"]
+        expected = headers.get("Content-Length")
+        self.expected = int(expected) if expected and expected.isdigit() else None
+        # a compressed body is decoded while reading, so its size won't match the header
+        self.encoded = bool(headers.get("Content-Encoding"))
+        if self.max_bytes and self.expected is not None and self.expected > self.max_bytes:
+            raise ValueError(f"Asset too large ({self.expected} > {self.max_bytes} bytes): {url}")
+
+        blobs_dir = _config["cache_dir"] / "blobs"
+        blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp = blobs_dir / f".download.{os.getpid()}.{threading.get_ident()}.{id(self)}.tmp"
+        self.f = open(self.tmp, "wb")
+        self.h = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise ValueError(f"Asset too large (> {self.max_bytes} bytes): {self.url}")
+        self.h.update(chunk)
+        self.f.write(chunk)
+
+    def commit(self) -> tuple:
+        """Moves the finished download to its content address. Returns (sha256, size)."""
+        self.f.close()
+        if self.expected is not None and self.size != self.expected and not self.encoded:
+            raise ValueError(f"Truncated download ({self.size} of {self.expected} bytes): {self.url}")
+
+        digest = self.h.hexdigest()
+        dst = blob_path(digest)
+        if dst.exists():
+            self.tmp.unlink()
+        else:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.tmp, dst)
+        return digest, self.size
+
+    def abort(self):
+        self.f.close()
+        try:
+            self.tmp.unlink()
+        except OSError:
+            pass
+
+
+def stream_to_blob(url: str, r) -> tuple:
+    """
+    Streams the response body into the blob store chunk by chunk.
+    Returns (sha256, size). Oversized or truncated bodies raise and leave nothing behind.
+    """
+    writer = BlobWriter(url, r.headers)
+    try:
+        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def materialize(digest: str, path: Path):
+    """Points path at the blob: hardlink when possible, copy otherwise. Never writes in place."""
+    src = blob_path(digest)
+    try:
+        if path.exists() and os.path.samefile(src, path):
+            return
+    except OSError:
+        pass
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_sibling(path)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, path)
+
+
+def _record_manifest(path: Path, record: dict):
+    manifest_path = path.parent / MANIFEST_NAME
+    manifest = _read_json(manifest_path) or {}
+    if manifest.get(path.name) == record:
+        return
+    manifest[path.name] = record
+    _write_json(manifest_path, manifest)
+
+
+def lookup(url: str):
+    """Returns the stored record for url if its blob is still present, else None."""
+    known = _read_json(url_record_path(url))
+    if known and not blob_path(known.get("sha256", "")).exists():
+        return None
+    return known
+
+
+def conditional_headers(known) -> dict:
+    headers = {}
+    if known:
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
+    return headers
+
+
+def reuse(known: dict, path: Path) -> bool:
+    """use_known for a cache hit (no download)."""
+    metrics.incr("asset_store.hit")
+    return use_known(known, path)
+
+
+def use_known(known: dict, path: Path) -> bool:
+    materialize(known["sha256"], path)
+    _record_manifest(path, known)
+    return True
+
+
+def store(url: str, path: Path, digest: str, size: int, headers) -> bool:
+    metrics.incr("asset_store.miss")
+    metrics.incr("download.bytes", size)
+    record = {
+        "url": url,
+        "sha256": digest,
+        "size": size,
+        "etag": headers.get("ETag", ""),
+        "last_modified": headers.get("Last-Modified", ""),
+        "fetched_at": time.time(),
+    }
+    _write_json(url_record_path(url), record)
+    return use_known(record, path)
+
+
+def fetch(url: str, path) -> bool:
+    """
+    Makes path hold the image at url, downloading only what is not known yet.
+    Returns True if the file is in place, False for an empty url.
+    """
+    if not url:
+        return False
+    path = Path(path)
+
+    known = lookup(url)
+    if known and not revalidating():
+        return reuse(known, path)
+
+    with http_client.get(url, headers=conditional_headers(known), stream=True) as r:
+        if known and r.status_code == 304:
+            return reuse(known, path)
+        r.raise_for_status()
+        check_content_type(url, r.headers)
+        digest, size = stream_to_blob(url, r)
+        headers = r.headers
+
+    return store(url, path, digest, size, headers)
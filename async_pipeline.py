@@ -0,0 +1,317 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import aiohttp
+from google_play_scraper.constants.request import Formats
+from google_play_scraper.features.app import parse_dom
+
+import asset_store
+import cdn_images
+import checkpoint
+import delta
+import locales
+import http_client
+import metrics
+import metadata_cache
+import packages_parser
+import rate_limit
+from apple_store_parser import apple_to_row, normalize_track_id
+
+# asyncio counterpart of packages_parser.parse_entries: Google pages and images are
+# fetched with aiohttp behind one event loop, with a semaphore per host. It reuses the
+# metadata cache, asset store and xlsx writer, so both pipelines produce the same output.
+
+DEFAULT_CONCURRENCY = 64    # entries in flight
+PER_HOST_LIMIT = 16         # concurrent requests per host
+CHUNK_SIZE = asset_store.CHUNK_SIZE
+
+
+class FetchContext:
+    def __init__(self, session, per_host=PER_HOST_LIMIT):
+        self.session = session
+        self.per_host = per_host
+        self.semaphores = {}
+        retry = http_client.get_config()
+        self.retries = retry["retries"]
+        self.backoff_factor = retry["backoff_factor"]
+
+    def semaphore(self, url: str):
+        host = urlsplit(url).hostname or ""
+        sem = self.semaphores.get(host)
+        if sem is None:
+            sem = self.semaphores[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+
+@asynccontextmanager
+async def get(ctx: FetchContext, url: str, **kwargs):
+    """
+    GET with the same rate limiting and retry policy as http_client.get. The host
+    slot is held until the caller has finished reading the response.
+    """
+    bucket = rate_limit.for_url(url)
+    attempt = 0
+    while True:
+        wait = bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        delay = 0.0
+        async with ctx.semaphore(url):
+            start = time.perf_counter()
+            try:
+                r = await ctx.session.get(url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                metrics.observe_request(url, time.perf_counter() - start)
+                metrics.incr("http.errors")
+                if attempt >= ctx.retries:
+                    raise
+                metrics.incr("http.retries")
+                delay = http_client.backoff_delay(attempt, backoff_factor=ctx.backoff_factor)
+            else:
+                metrics.observe_request(url, time.perf_counter() - start)
+                metrics.incr("http.requests")
+                if r.status not in http_client.RETRY_STATUSES or attempt >= ctx.retries:
+                    if r.status in http_client.RETRY_STATUSES:
+                        bucket.throttled(http_client.parse_retry_after(r.headers.get("Retry-After")))
+                    else:
+                        bucket.succeeded()
+                    if r.status >= 400:
+                        metrics.incr("http.errors")
+                    try:
+                        yield r
+                    finally:
+                        r.release()
+                    return
+
+                retry_after = http_client.parse_retry_after(r.headers.get("Retry-After"))
+                bucket.throttled(retry_after)
+                metrics.incr("http.retries")
+                r.release()
+                if not retry_after:
+                    delay = http_client.backoff_delay(attempt, backoff_factor=ctx.backoff_factor)
+        attempt += 1
+        if delay:
+            await asyncio.sleep(delay)
+
+
+async def parse_google_async(ctx: FetchContext, package, lang="en", country="us"):
+    cached = metadata_cache.load("google", package, country, lang)
+    if cached:
+        return cached
+
+    try:
+        url = Formats.Detail.build(app_id=package, lang=lang, country=country)
+        async with get(ctx, url) as r:
+            status = r.status
+            dom = await r.text() if status < 400 else ""
+        if status == 404:
+            url = Formats.Detail.fallback_build(app_id=package, lang=lang)
+            async with get(ctx, url) as r:
+                status = r.status
+                dom = await r.text() if status < 400 else ""
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        status, error = 0, e
+    else:
+        error = f"Google Play returned {status}"
+
+    if status == 0 or status >= 400:
+        stale = metadata_cache.load_stale("google", package, country, lang)
+        if stale and status != 404:
+            print(f"Google fetch failed, using cached data: {package}: {error}")
+            return stale
+        raise ValueError(f"{error} for {package}")
+
+    parsed = parse_dom(dom=dom, app_id=package, url=url)
+    metadata_cache.save("google", package, parsed, country, lang)
+    return parsed
+
+
+async def download_file_async(ctx: FetchContext, url: str, path, original_url: str = "") -> bool:
+    """Async twin of packages_parser.download_file."""
+    try:
+        with metrics.timer("asset.download"):
+            return await _download_file_async(ctx, url, path)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if original_url and original_url != url:
+            metrics.incr("asset.resize_failed")
+            print(f"Sized asset failed, fetching the original: {url}: {e}")
+            return await download_file_async(ctx, original_url, path)
+        metrics.incr("asset.failed")
+        print(f"Asset download failed: {url}: {e}")
+        return False
+
+
+async def _download_file_async(ctx: FetchContext, url: str, path) -> bool:
+    if not url:
+        return False
+    path = Path(path)
+
+    known = asset_store.lookup(url)
+    if known and not asset_store.revalidating():
+        return asset_store.reuse(known, path)
+
+    async with get(ctx, url, headers=asset_store.conditional_headers(known)) as r:
+        if known and r.status == 304:
+            return asset_store.reuse(known, path)
+        r.raise_for_status()
+        asset_store.check_content_type(url, r.headers)
+
+        writer = asset_store.BlobWriter(url, r.headers)
+        try:
+            async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                writer.write(chunk)
+            digest, size = writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        headers = r.headers
+
+    return asset_store.store(url, path, digest, size, headers)
+
+
+async def request_icon_and_screens_async(ctx: FetchContext, key: str, icon_url: str, screenshots: list,
+                                         max_shots=packages_parser.MAX_SCREENSHOTS, locale=locales.DEFAULT_LOCALE):
+    folder = packages_parser.get_app_folder_by_key(key, locale)
+
+    icon_path = f"{folder}/icon.png"
+    shot_paths = [f"{folder}/screenshot{i}.png" for i in range(len((screenshots or [])[:max_shots]))]
+
+    jobs = [download_file_async(ctx, cdn_images.icon_url(icon_url), icon_path, icon_url)]
+    jobs += [download_file_async(ctx, cdn_images.screenshot_url(u), p, u) for u, p in zip(screenshots, shot_paths)]
+    done = await asyncio.gather(*jobs)
+
+    shot_paths = [p for p, ok in zip(shot_paths, done[1:]) if ok or os.path.exists(p)]
+    return icon_path, shot_paths
+
+
+async def fetch_record_async(ctx: FetchContext, entry, apple_results, previous=None,
+                             locale=locales.DEFAULT_LOCALE):
+    """Async twin of packages_parser.fetch_record (Apple data always comes prefetched)."""
+    country, lang = locale
+    google_id = entry.get("google", "")
+    apple_id = normalize_track_id(entry.get("apple", ""))
+
+    google_data = None
+    apple_data = None
+
+    if google_id:
+        try:
+            with metrics.timer("google.fetch"):
+                g = await parse_google_async(ctx, google_id, lang=lang, country=country)
+            google_data = packages_parser.filter_google(g)
+        except Exception as e:
+            metrics.incr("google.failed")
+            print(f"Google parse failed: {google_id}: {e}")
+
+    if apple_id:
+        a = (apple_results or {}).get(apple_id)
+        if a:
+            apple_data = apple_to_row(a)
+
+    if not google_data and not apple_data:
+        return None
+
+    key = packages_parser.get_record_key(
+        (google_data or {}).get("google_id", ""),
+        (apple_data or {}).get("apple_id", ""),
+    )
+
+    icon_url, screenshots = packages_parser.pick_asset_urls(google_data, apple_data)
+
+    reused = packages_parser.previous_assets(previous, key, google_data, apple_data)
+    if reused:
+        icon_path, screenshot_paths = reused
+    else:
+        icon_path, screenshot_paths = await request_icon_and_screens_async(
+            ctx, key, icon_url, screenshots, locale=locale,
+        )
+
+    return packages_parser.make_record(key, google_data, apple_data, icon_path, screenshot_paths)
+
+
+async def fetch_entry_async(ctx: FetchContext, entry, apple_results, baseline=None, locale=locales.DEFAULT_LOCALE):
+    previous = baseline.find(entry) if baseline is not None else None
+    with metrics.timer("record.fetch"):
+        record = await fetch_record_async(ctx, entry, apple_results, previous, locale)
+    return packages_parser.finish_record(entry, record, baseline, previous)
+
+
+async def _done(record):
+    return record
+
+
+async def prefetch_apple_async(entries, chunk_size=packages_parser.APPLE_CHUNK_SIZE, journal=None,
+                               locale=locales.DEFAULT_LOCALE):
+    # one batched iTunes lookup per chunk; it's a single request, so a worker thread is fine
+    chunk = []
+    for entry in entries:
+        chunk.append((entry, journal.lookup(entry) if journal else None))
+        if len(chunk) >= chunk_size:
+            for item in await asyncio.to_thread(lambda c=chunk: list(packages_parser._resolve_apple_chunk(c, locale))):
+                yield item
+            chunk = []
+    if chunk:
+        for item in await asyncio.to_thread(lambda c=chunk: list(packages_parser._resolve_apple_chunk(c, locale))):
+            yield item
+
+
+async def parse_entries_async(entries, concurrency=DEFAULT_CONCURRENCY, per_host=PER_HOST_LIMIT,
+                              apple_chunk_size=packages_parser.APPLE_CHUNK_SIZE, xlsx=True,
+                              xlsx_images="embed", streaming=False, shard=None, resume=False,
+                              since_last_run=None, locale=locales.DEFAULT_LOCALE):
+    file_name, dataset_file, journal_file = packages_parser.output_files(shard, locale)
+    baseline = packages_parser.load_baseline(since_last_run, dataset_file)
+    report = delta.ChangeReport(baseline) if baseline is not None else None
+    journal = checkpoint.Journal(journal_file, resume)
+    sink = packages_parser.RecordSink(
+        xlsx=xlsx, file_name=file_name, dataset_file=dataset_file,
+        xlsx_images=xlsx_images, streaming=streaming, journal=journal,
+    )
+    entries = checkpoint.select_shard(entries, shard)
+
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=per_host)
+    timeout = aiohttp.ClientTimeout(total=http_client.TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        ctx = FetchContext(session, per_host)
+        pending = deque()
+
+        async def write_next():
+            record = await pending.popleft()
+            if record:
+                sink.write(record)
+                if report is not None:
+                    report.add(record)
+
+        try:
+            async for entry, apple_results, done in prefetch_apple_async(entries, apple_chunk_size, journal, locale):
+                job = _done(done) if done else fetch_entry_async(ctx, entry, apple_results, baseline, locale)
+                pending.append(asyncio.create_task(job))
+                if len(pending) >= concurrency:
+                    await write_next()
+            while pending:
+                await write_next()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    sink.close()
+    if report is not None:
+        report.write(packages_parser.change_report_file(shard, locale))
+
+
+def parse_entries(entries, concurrency=DEFAULT_CONCURRENCY, per_host=PER_HOST_LIMIT, xlsx=True,
+                  xlsx_images="embed", streaming=False, shard=None, resume=False, since_last_run=None,
+                  locale=locales.DEFAULT_LOCALE):
+    asyncio.run(parse_entries_async(
+        entries, concurrency, per_host, xlsx=xlsx, xlsx_images=xlsx_images, streaming=streaming,
+        shard=shard, resume=resume, since_last_run=since_last_run, locale=locale,
+    ))
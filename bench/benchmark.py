@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_store import FakeStore
+
+# Offline benchmark: runs runner.py and html_creator.py as subprocesses against a
+# local FakeStore, in a scratch directory (cold caches), and reports per scenario
+#   throughput (entries/s), p50/p99 per-entry latency (from the record.fetch
+#   histogram), wall time and peak RSS of each process.
+#
+#   python bench/benchmark.py                       # 100 and 1k entries
+#   python bench/benchmark.py --scenarios 10k --latency-ms 80 --error-rate 0.02
+#   python bench/benchmark.py --runner-arg=--async --runner-arg=--no-xlsx
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = {"100": 100, "1k": 1000, "10k": 10000}
+DEFAULT_SCENARIOS = ("100", "1k")
+APPLE_EVERY = 3     # every 3rd synthetic entry also has an App Store id
+APPLE_ONLY_EVERY = 10
+
+
+def make_entries(count: int) -> list:
+    entries = []
+    for i in range(count):
+        entry = {"google": f"bench.app{i}"}
+        if i % APPLE_EVERY == 0:
+            entry["apple"] = str(1000000000 + i)
+        if i % APPLE_ONLY_EVERY == APPLE_ONLY_EVERY - 1:
+            entry = {"apple": str(1000000000 + i)}
+        entries.append(entry)
+    return entries
+
+
+def run_measured(cmd, cwd: Path, log: Path) -> dict:
+    """Runs cmd to completion; returns wall time, exit code and the child's own peak RSS."""
+    start = time.perf_counter()
+    with open(log, "w", encoding="utf-8") as out:
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=out, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {"wall_s": round(wall, 3), "peak_rss_mib": round(rss / 1048576, 1), "exit_code": proc.returncode}
+
+
+def read_metrics(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def run_scenario(name: str, count: int, store: FakeStore, workdir: Path, runner_args, html_args) -> dict:
+    workdir.mkdir(parents=True, exist_ok=True)
+    with open(workdir / "packages.json", "w", encoding="utf-8") as f:
+        json.dump(make_entries(count), f)
+
+    runner_cmd = [
+        sys.executable, str(ROOT / "runner.py"), "packages.json",
+        "--play-base-url", store.base_url, "--itunes-lookup-url", store.lookup_url,
+        "--no-rate-limit", "--metrics", "metrics/runner.json", *runner_args,
+    ]
+    html_cmd = [
+        sys.executable, str(ROOT / "html_creator.py"), "--metrics", "metrics/html_creator.json", *html_args,
+    ]
+
+    requests_before = store.requests
+    runner = run_measured(runner_cmd, workdir, workdir / "runner.log")
+    runner["requests"] = store.requests - requests_before
+    html = run_measured(html_cmd, workdir, workdir / "html_creator.log")
+
+    runner_metrics = read_metrics(workdir / "metrics" / "runner.json")
+    fetch = runner_metrics.get("stages", {}).get("record.fetch", {})
+    runner.update({
+        "entries_per_s": round(count / runner["wall_s"], 1) if runner["wall_s"] else 0.0,
+        "entry_p50_ms": round(fetch.get("p50_s", 0) * 1000, 1),
+        "entry_p99_ms": round(fetch.get("p99_s", 0) * 1000, 1),
+        "records": runner_metrics.get("counters", {}).get("records.written", 0),
+        "downloaded_mib": round(runner_metrics.get("counters", {}).get("download.bytes", 0) / 1048576, 1),
+    })
+    html_metrics = read_metrics(workdir / "metrics" / "html_creator.json")
+    html.update({
+        "cards_per_s": round(count / html["wall_s"], 1) if html["wall_s"] else 0.0,
+        "stages_s": {k: v["total_s"] for k, v in html_metrics.get("stages", {}).items()},
+    })
+    return {"scenario": name, "entries": count, "runner": runner, "html_creator": html}
+
+
+def print_table(results):
+    print()
+    print(f"{'scenario':>8} | {'runner s':>8} {'entries/s':>9} {'p50 ms':>7} {'p99 ms':>7} {'RSS MiB':>7} "
+          f"| {'html s':>7} {'cards/s':>8} {'RSS MiB':>7}")
+    for r in results:
+        a, b = r["runner"], r["html_creator"]
+        print(f"{r['scenario']:>8} | {a['wall_s']:>8.2f} {a['entries_per_s']:>9.1f} {a['entry_p50_ms']:>7.1f} "
+              f"{a['entry_p99_ms']:>7.1f} {a['peak_rss_mib']:>7.1f} "
+              f"| {b['wall_s']:>7.2f} {b['cards_per_s']:>8.1f} {b['peak_rss_mib']:>7.1f}")
+        for tool in ("runner", "html_creator"):
+            if r[tool]["exit_code"]:
+                print(f"{'':>8}   {tool} exited with {r[tool]['exit_code']}, see its log in the work directory")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(usage="python bench/benchmark.py [options]")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(DEFAULT_SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake store latency per response")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument(
+        "--runner-arg", action="append", default=[], metavar="ARG",
+        help="extra runner.py argument (repeatable), e.g. --runner-arg=--async",
+    )
+    parser.add_argument(
+        "--html-arg", action="append", default=[], metavar="ARG",
+        help="extra html_creator.py argument (repeatable), e.g. --html-arg=--derivatives=webp",
+    )
+    parser.add_argument("--workdir", default=None, help="keep scenario directories here (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    store = FakeStore(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate, image_size=args.image_size,
+    ).start()
+
+    results = []
+    tmp = None
+    try:
+        if args.workdir:
+            base = Path(args.workdir)
+        else:
+            tmp = tempfile.TemporaryDirectory(prefix="apps-bench-")
+            base = Path(tmp.name)
+        for name in args.scenarios:
+            print(f"Scenario {name}: {SCENARIOS[name]} entries ...", flush=True)
+            results.append(run_scenario(
+                name, SCENARIOS[name], store, base / name, args.runner_arg, args.html_arg,
+            ))
+    finally:
+        store.stop()
+        if tmp is not None:
+            tmp.cleanup()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate, "results": results,
+            }, f, indent=2)
+        print(f"Results written: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import importlib.util
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Times html_creator's card preparation (load_cards: parse, sort, normalize ids,
+# format dates, content keys, search strings) and card rendering for a synthetic
+# catalogue, from apps.jsonl and from apps.xlsx. --baseline loads another copy of
+# html_creator.py to compare against, e.g. an older revision:
+#
+#   git show HEAD~1:html_creator.py > /tmp/html_creator_old.py
+#   python bench/card_prep.py --rows 10000 --baseline /tmp/html_creator_old.py
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+GENRES = ("Puzzle", "Arcade", "Casual", "Tools", "Education")
+
+
+def make_rows(count: int, seed=0) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        installs = rng.choice((1000, 10000, 100000, 1000000, 10000000))
+        apple_id = str(1000000000 + i) if i % 3 == 0 else ""
+        google_id = f"com.bench.app{i}" if i % 10 != 9 else ""
+        rows.append({
+            "key": google_id or f"apple_{apple_id}",
+            "google_id": google_id,
+            "apple_id": apple_id,
+            "title": f"Bench App {i}",
+            "genre": GENRES[i % len(GENRES)],
+            "installs": f"{installs:,}+",
+            "installs_num": installs,
+            "release_date": f"20{10 + i % 15}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "google_url": f"https://play.google.com/store/apps/details?id={google_id}" if google_id else "",
+            "apple_url": f"https://apps.apple.com/app/id{apple_id}" if apple_id else "",
+        })
+    return rows
+
+
+def write_inputs(rows: list, workdir: Path):
+    with open(workdir / "apps.jsonl", "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    df = pd.DataFrame({
+        "Title": [r["title"] for r in rows],
+        "Genre": [r["genre"] for r in rows],
+        "Installs": [r["installs"] for r in rows],
+        "Release Date": [r["release_date"] for r in rows],
+        "Google App ID": [r["google_id"] for r in rows],
+        "Apple Track ID": [int(r["apple_id"]) if r["apple_id"] else None for r in rows],
+        "Google Url": [r["google_url"] for r in rows],
+        "Apple Url": [r["apple_url"] for r in rows],
+    })
+    df.to_excel(workdir / "apps.xlsx", startrow=1, index=False)
+
+
+def load_module(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def best_of(repeat: int, fn):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def measure(module, workdir: Path, repeat: int) -> dict:
+    result = {}
+    for source in ("apps.jsonl", "apps.xlsx"):
+        seconds, cards = best_of(repeat, lambda: module.load_cards(workdir / source))
+        result[f"load {source}"] = seconds
+    seconds, _ = best_of(repeat, lambda: [
+        module.render_card(c, f"assets/{c['key']}/icon.png", [f"assets/{c['key']}/screenshot0.png"])
+        for c in cards
+    ])
+    result["render"] = seconds
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(usage="python bench/card_prep.py [options]")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--baseline", default=None, metavar="PATH", help="another html_creator.py to compare with")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    modules = [("current", ROOT / "html_creator.py")]
+    if args.baseline:
+        modules.insert(0, ("baseline", Path(args.baseline)))
+
+    with tempfile.TemporaryDirectory(prefix="apps-cards-") as tmp:
+        workdir = Path(tmp)
+        write_inputs(make_rows(args.rows), workdir)
+        results = {name: measure(load_module(f"html_creator_{name}", path), workdir, args.repeat)
+                   for name, path in modules}
+
+    print(f"{args.rows} cards, best of {args.repeat}:")
+    print(f"{'stage':>16} | " + " ".join(f"{name:>10}" for name, _ in modules))
+    for stage in results["current"]:
+        line = f"{stage:>16} | " + " ".join(f"{results[name][stage]:>9.3f}s" for name, _ in modules)
+        if args.baseline:
+            line += f"  x{results['baseline'][stage] / results['current'][stage]:.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from google_play_scraper.constants.element import ElementSpecs
+
+# Local stand-in for the stores, for benchmarks: one HTTP server that answers
+#   /store/apps/details?id=...   Play detail pages in the shape parse_dom expects
+#   /lookup?id=1,2,...           iTunes lookup JSON
+#   /img/<app>/<name>[=w..-h..]  PNG images, unique per URL, resized like the Play CDN
+# with a configurable latency (+ jitter) and a share of 503 responses.
+#
+#   python bench/fake_store.py --port 8765 --latency-ms 50 --error-rate 0.01
+#   python runner.py apps.json --play-base-url http://127.0.0.1:8765 \
+#       --itunes-lookup-url http://127.0.0.1:8765/lookup --no-rate-limit
+
+SCREENSHOTS_PER_APP = 4
+IMAGE_SIZE = 256
+GENRES = ("Puzzle", "Arcade", "Casual", "Tools", "Education")
+
+
+def png(seed: int, size=IMAGE_SIZE, height=None) -> bytes:
+    """A valid RGB PNG (size x height, square by default) whose pixels depend on seed."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    width, height = size, height or size
+    rng = random.Random(seed)
+    # a noisy third per row keeps the compressed size in the range of real store images
+    flat = bytes(range(256)) * (width * 2 // 256 + 1)
+    raw = b"".join(b"\x00" + rng.randbytes(width) + flat[y % 256:y % 256 + width * 2] for y in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def image_size(path: str, size: int) -> tuple:
+    """Like the Play CDN: "<image>=w<W>-h<H>" (either part optional) fits the image in
+    that box, without upscaling; no options serves the original (size x size)."""
+    _, _, options = path.partition("=")
+    box = dict(re.findall(r"([wh])(\d+)", options))
+    scale = min([int(v) / size for v in box.values()] + [1.0])
+    return max(1, round(size * scale)), max(1, round(size * scale))
+
+
+def _put(root: list, path: list, value):
+    node = root
+    for i, index in enumerate(path):
+        while len(node) <= index:
+            node.append(None)
+        if i == len(path) - 1:
+            node[index] = value
+        else:
+            if node[index] is None:
+                node[index] = []
+            node = node[index]
+
+
+def play_page(base: str, app_id: str) -> str:
+    n = zlib.crc32(app_id.encode("utf-8"))
+    values = {
+        "title": f"Bench {app_id}",
+        "installs": f"{(n % 1000 + 1) * 1000:,}+",
+        "minInstalls": (n % 1000 + 1) * 1000,
+        "realInstalls": (n % 1000 + 1) * 1000 + n % 997,
+        "genre": GENRES[n % len(GENRES)],
+        "icon": f"{base}/img/{app_id}/icon",
+        "released": "Jan 2, 2020",
+        "updated": 1600000000 + n % 10000000,
+        "version": f"1.{n % 50}",
+        "developer": "Bench Studio",
+    }
+    ds = []
+    for key, value in values.items():
+        _put(ds, ElementSpecs.Detail[key].data_map, value)
+    shots = [[None, None, None, [None, None, f"{base}/img/{app_id}/s{i}"]] for i in range(SCREENSHOTS_PER_APP)]
+    _put(ds, ElementSpecs.Detail["screenshots"].data_map, shots)
+    return (
+        "<html><body><script>AF_initDataCallback({key: 'ds:5', hash: '1', "
+        f"data:{json.dumps(ds)}, sideChannel: {{}}}});</script></body></html>"
+    )
+
+
+def lookup_result(base: str, track_id: str) -> dict:
+    return {
+        "trackId": int(track_id),
+        "trackName": f"Bench iOS {track_id}",
+        "artworkUrl512": f"{base}/img/a{track_id}/icon",
+        "screenshotUrls": [f"{base}/img/a{track_id}/s{i}" for i in range(SCREENSHOTS_PER_APP)],
+        "releaseDate": "2021-01-01T00:00:00Z",
+        "currentVersionReleaseDate": "2024-05-01T00:00:00Z",
+        "trackViewUrl": f"https://apps.apple.com/app/id{track_id}",
+        "primaryGenreName": "Games",
+    }
+
+
+class FakeStore:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 image_size=IMAGE_SIZE, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.image_size = image_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def lookup_url(self) -> str:
+        return f"{self.base_url}/lookup"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _delay_and_fail(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def _handler(self):
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, code, body: bytes, content_type):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                base = f"http://{self.headers['Host']}"
+                if store._delay_and_fail():
+                    self.send(503, b"unavailable", "text/plain")
+                elif url.path == "/store/apps/details" and query.get("id"):
+                    self.send(200, play_page(base, query["id"][0]).encode("utf-8"), "text/html; charset=utf-8")
+                elif url.path == "/lookup" and query.get("id"):
+                    ids = [i for i in query["id"][0].split(",") if i.isdigit()]
+                    results = [lookup_result(base, i) for i in ids]
+                    body = json.dumps({"resultCount": len(results), "results": results}).encode("utf-8")
+                    self.send(200, body, "application/json")
+                elif url.path.startswith("/img/"):
+                    seed = zlib.crc32(url.path.split("=", 1)[0].encode("utf-8"))
+                    self.send(200, png(seed, *image_size(url.path, store.image_size)), "image/png")
+                else:
+                    self.send(404, b"not found", "text/plain")
+
+        return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(usage="python bench/fake_store.py [options]")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- random spread of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--image-size", type=int, default=IMAGE_SIZE, help="edge of the square PNGs, px")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    store = FakeStore(
+        args.host, args.port, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate, image_size=args.image_size,
+    )
+    print(f"Fake store on {store.base_url} (lookup: {store.lookup_url})")
+    try:
+        store.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,74 @@
+import re
+import threading
+from urllib.parse import urlsplit
+
+# The store CDNs resize images on request, so assets are downloaded at the size
+# the site shows them (2x, for high-density screens) instead of as originals:
+#   Google  https://play-lh.googleusercontent.com/<id>[=<options>]     -> <id>=w144-h144
+#   Apple   https://is1-ssl.mzstatic.com/image/thumb/.../1242x2208bb.png -> .../439x780bb.png
+# URLs of other hosts are left alone. Datasets keep the original URLs (delta mode
+# compares them); only downloads use the sized ones, and fall back to the
+# original when the sized request fails.
+
+ICON_BOX = (144, 144)    # html_creator ICON_SIZE, 2x
+SCREENSHOT_HEIGHT = 780  # html_creator SCREENSHOT_H, 2x; screenshots are cropped to cover SCREENSHOT_W
+
+GOOGLE_HOSTS = ("googleusercontent.com", "ggpht.com")
+APPLE_HOSTS = ("mzstatic.com",)
+APPLE_SIZE = re.compile(r"(?P<w>\d+)x(?P<h>\d+)(?P<rest>[a-z]*(?:-\d+)?\.\w+)$")
+
+_config = {
+    "enabled": True,
+    "google_hosts": GOOGLE_HOSTS,
+}
+_lock = threading.Lock()
+
+
+def configure(enabled=None, google_hosts=None):
+    """
+    enabled=False downloads the original images.
+    google_hosts: extra hosts that resize like the Play CDN (e.g. a Play mirror).
+    """
+    with _lock:
+        if enabled is not None:
+            _config["enabled"] = bool(enabled)
+        if google_hosts:
+            _config["google_hosts"] = GOOGLE_HOSTS + tuple(h.lower() for h in google_hosts if h)
+
+
+def enabled() -> bool:
+    return _config["enabled"]
+
+
+def _host_in(url: str, hosts) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def sized_url(url: str, width=None, height=None) -> str:
+    """url asking the CDN for an image that fits width x height (None: any), or url itself."""
+    if not url or not enabled() or not (width or height):
+        return url
+    if _host_in(url, _config["google_hosts"]):
+        base = url.split("=", 1)[0]
+        options = [f"w{width}"] if width else []
+        options += [f"h{height}"] if height else []
+        return f"{base}={'-'.join(options)}"
+    if _host_in(url, APPLE_HOSTS) and "/image/thumb/" in url:
+        m = APPLE_SIZE.search(url)
+        if not m:
+            return url
+        w, h = int(m["w"]), int(m["h"])
+        scale = min(width / w if width else 1.0, height / h if height else 1.0)
+        if scale >= 1.0:  # never ask for more than the original
+            return url
+        return f"{url[:m.start()]}{max(1, round(w * scale))}x{max(1, round(h * scale))}{m['rest']}"
+    return url
+
+
+def icon_url(url: str) -> str:
+    return sized_url(url, *ICON_BOX)
+
+
+def screenshot_url(url: str) -> str:
+    return sized_url(url, height=SCREENSHOT_HEIGHT)
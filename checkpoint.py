@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+from apple_store_parser import normalize_track_id
+
+# Sharding and resumable runs.
+# A shard is selected by a stable hash of the entry's id, so the same app always
+# lands in the same shard across runs and CI matrix jobs. Every completed record
+# is appended to a journal (JSON Lines, flushed per line); a restarted run with
+# resume=True takes finished records from it instead of fetching them again.
+# The journal is deleted when its run completes.
+
+
+def entry_id(entry) -> str:
+    return f"{entry.get('google', '') or ''}|{normalize_track_id(entry.get('apple', ''))}"
+
+
+def parse_shard(value: str):
+    """'i/N' (1-based) -> (i, N)"""
+    index, sep, count = str(value).partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"expected i/N, got {value!r}")
+    if not sep or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"expected i/N with 1 <= i <= N, got {value!r}")
+    return index, count
+
+
+def shard_of(entry, count: int) -> int:
+    """1-based shard number of entry."""
+    key = entry.get("google") or f"apple:{normalize_track_id(entry.get('apple', ''))}"
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(entries, shard):
+    if not shard:
+        yield from entries
+        return
+    index, count = shard
+    for entry in entries:
+        if shard_of(entry, count) == index:
+            yield entry
+
+
+def shard_suffix(shard) -> str:
+    return f".shard-{shard[0]}-of-{shard[1]}" if shard else ""
+
+
+class Journal:
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.done = {}
+        if resume:
+            self.done = read_journal(path)
+            if self.done:
+                print(f"Resuming: {len(self.done)} records from {path}")
+        self.f = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def lookup(self, entry):
+        return self.done.get(entry_id(entry))
+
+    def append(self, record):
+        eid = record.get("entry_id")
+        if not eid or eid in self.done:
+            return
+        self.done[eid] = record
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    def discard(self):
+        """Closes and deletes the journal once its run has completed: --resume only continues interrupted runs."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def read_journal(path) -> dict:
+    done = {}
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except OSError:
+        return done
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last line may be cut off by the crash we are resuming from
+                continue
+            if record.get("entry_id"):
+                done[record["entry_id"]] = record
+    return done
+
+
+def iter_dataset(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def merge_datasets(inputs, output):
+    """
+    Concatenates shard datasets into one, dropping repeated keys (first wins).
+    Yields the merged rows so a caller can export them further.
+    """
+    seen = set()
+    tmp = f"{output}.tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for path in inputs:
+            for row in iter_dataset(path):
+                key = row.get("key")
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                yield row
+    os.replace(tmp, output)
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from apple_store_parser import normalize_track_id
+
+# Delta runs (--since-last-run): every entry is compared with its row from the
+# previous run's dataset. An app whose store "last updated" markers (Google's
+# `updated`, iTunes' `currentVersionReleaseDate`) and image URL lists are all
+# unchanged keeps its previous icon/screenshots without any asset requests; an
+# app whose fetch fails keeps its previous row. Differences go to a change report.
+# Apps that had not been updated in the store for QUIET_AFTER when they were last
+# fetched reuse their cached store metadata for up to QUIET_TTL instead of the
+# metadata_cache TTL, so a nightly run only sends requests for recently active
+# (or new) apps; the metadata cache has to survive between runs for this.
+
+CHANGE_REPORT = "changes.json"
+QUIET_AFTER = 30 * 24 * 3600
+QUIET_TTL = 7 * 24 * 3600
+
+# a difference in any of these means the app changed in the store
+SIGNATURE_FIELDS = ("google_updated", "apple_updated", "icon_url", "screenshot_urls")
+# fields listed per app in the change report
+REPORT_FIELDS = (
+    "title", "genre", "installs", "release_date", "google_url", "apple_url",
+) + SIGNATURE_FIELDS
+
+ADDED = "added"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+STALE = "stale"
+
+
+class Baseline:
+    """The previous run's dataset rows, looked up by Google id, then Apple id."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        self.by_google = {}
+        self.by_apple = {}
+        self.mtime = None
+        try:
+            f = open(path, "r", encoding="utf-8")
+        except OSError:
+            print(f"No previous run at {path}: fetching everything")
+            return
+        with f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                key = row.get("key")
+                self.rows[key] = row
+                if row.get("google_id"):
+                    self.by_google[row["google_id"]] = key
+                if row.get("apple_id"):
+                    self.by_apple[normalize_track_id(row["apple_id"])] = key
+
+    def find(self, entry):
+        google_id = entry.get("google", "")
+        apple_id = normalize_track_id(entry.get("apple", ""))
+        key = (google_id and self.by_google.get(google_id)) or (apple_id and self.by_apple.get(apple_id))
+        return self.rows.get(key) if key else None
+
+
+def updated_at(value):
+    """Epoch seconds of a store update marker (Google: epoch int, iTunes: ISO 8601), or None."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def quiet_ttls(baseline: Baseline, now=None) -> dict:
+    """{(store, id): QUIET_TTL} for the baseline's apps that were quiet in that store (see metadata_cache.configure)."""
+    now = time.time() if now is None else now
+    ttls = {}
+    for row in baseline.rows.values():
+        for store, id_field, updated_field in (("google", "google_id", "google_updated"),
+                                               ("apple", "apple_id", "apple_updated")):
+            app_id = row.get(id_field)
+            updated = updated_at(row.get(updated_field))
+            if app_id and updated is not None and now - updated >= QUIET_AFTER:
+                if store == "apple":
+                    app_id = normalize_track_id(app_id)
+                ttls[(store, str(app_id))] = QUIET_TTL
+    return ttls
+
+
+def changed_fields(previous: dict, row: dict, fields=REPORT_FIELDS) -> list:
+    return [f for f in fields if (previous.get(f) or "") != (row.get(f) or "")]
+
+
+def is_unchanged(previous: dict, row: dict) -> bool:
+    return not changed_fields(previous, row, SIGNATURE_FIELDS)
+
+
+def reusable_assets(previous, key: str, row: dict):
+    """(icon_path, screenshot_paths) of previous if the app is unchanged and its files are still there."""
+    if not previous or previous.get("key") != key or not is_unchanged(previous, row):
+        return None
+    icon = previous.get("icon") or ""
+    shots = list(previous.get("screenshots") or [])
+    if (row.get("icon_url") and not icon) or len(shots) != len(row.get("screenshot_urls") or []):
+        return None
+    if not all(os.path.exists(p) for p in [icon] + shots if p):
+        return None
+    return icon, shots
+
+
+class ChangeReport:
+    def __init__(self, baseline: Baseline):
+        self.baseline = baseline
+        self.seen = set()
+        self.added = []
+        self.changed = {}
+        self.stale = []
+        self.unchanged = 0
+
+    def add(self, record):
+        change = record.get("change") or {}
+        status = change.get("status")
+        key = record["key"]
+        self.seen.add(key)
+        self.seen.add(change.get("previous_key"))
+        if status == ADDED:
+            self.added.append(key)
+        elif status == CHANGED:
+            self.changed[key] = change.get("fields") or []
+        elif status == STALE:
+            self.stale.append(key)
+        elif status == UNCHANGED:
+            self.unchanged += 1
+
+    def removed(self):
+        return [key for key in self.baseline.rows if key not in self.seen]
+
+    def write(self, path=CHANGE_REPORT):
+        since = self.baseline.mtime
+        report = {
+            "since": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(since)) if since else None,
+            "added": self.added,
+            "changed": self.changed,
+            "removed": self.removed(),
+            "stale": self.stale,
+            "unchanged": self.unchanged,
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        print(
+            f"Changes since last run: {len(self.added)} added, {len(self.changed)} changed, "
+            f"{len(report['removed'])} removed, {len(self.stale)} stale, {self.unchanged} unchanged -> {path}"
+        )
@@ -0,0 +1,172 @@
+import csv
+import hashlib
+import json
+
+from apple_store_parser import normalize_track_id
+
+# Lazy readers for package lists, so fetching can start on the first entry while
+# the rest of a very large list is still being read. Every reader yields
+# {"google": ..., "apple": ...} dicts.
+#   .jsonl / .ndjson  one JSON value per line
+#   .csv              header with google/apple columns (or: google[,apple] per row)
+#   .json             a JSON array, streamed element by element (or a single object)
+#   anything else     TXT: one google package id per line, "#" comments
+
+READ_CHUNK = 1 << 16
+
+GOOGLE_KEYS = ("google", "package", "android")
+APPLE_KEYS = ("apple", "trackId", "ios")
+
+
+def normalize_entry(x) -> dict:
+    if isinstance(x, str):
+        return {"google": x.strip(), "apple": ""}
+    if isinstance(x, dict):
+        google = next((x.get(k) for k in GOOGLE_KEYS if x.get(k)), "") or ""
+        apple = next((x.get(k) for k in APPLE_KEYS if x.get(k)), "") or ""
+        return {"google": str(google).strip(), "apple": str(apple).strip()}
+    raise ValueError("Unsupported JSON format. Expected list[str] or list[dict].")
+
+
+def iter_json_values(f, chunk_size=READ_CHUNK):
+    """
+    Streams a JSON document: the elements of a top-level array one by one, or a
+    sequence of top-level values (a single object, concatenated objects, JSON Lines).
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    in_array = None
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (in_array and buf[pos] == ",")):
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                if in_array:
+                    raise ValueError("Unexpected end of JSON array")
+                return
+            fill()
+            continue
+
+        if in_array is None:
+            in_array = buf[pos] == "["
+            if in_array:
+                pos += 1
+            continue
+        if in_array and buf[pos] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buf) and not eof:
+            # a number could continue in the next chunk
+            fill()
+            continue
+        pos = end
+        yield value
+
+
+def iter_csv(f):
+    reader = csv.reader(f)
+    header = None
+    for row in reader:
+        row = [c.strip() for c in row]
+        if not any(row) or row[0].startswith("#"):
+            continue
+        if header is None:
+            lowered = [c.lower() for c in row]
+            known = {k.lower() for k in GOOGLE_KEYS + APPLE_KEYS}
+            header = lowered if known & set(lowered) else []
+            if header:
+                continue
+        if header:
+            yield normalize_entry(dict(zip(
+                [next((k for k in GOOGLE_KEYS + APPLE_KEYS if k.lower() == h), h) for h in header],
+                row,
+            )))
+        else:
+            yield {"google": row[0], "apple": row[1] if len(row) > 1 else ""}
+
+
+def iter_txt(f):
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield {"google": line, "apple": ""}
+
+
+def _first_char(f) -> str:
+    while True:
+        pos = f.tell()
+        c = f.read(1)
+        if not c or not c.isspace():
+            f.seek(pos)
+            return c
+
+
+def iter_entries(file_path: str):
+    lower = file_path.lower()
+    with open(file_path, "r", encoding="utf-8-sig", newline="" if lower.endswith(".csv") else None) as f:
+        if lower.endswith(".csv"):
+            yield from iter_csv(f)
+            return
+
+        if lower.endswith((".json", ".jsonl", ".ndjson")) or _first_char(f) in ("[", "{"):
+            for value in iter_json_values(f):
+                yield normalize_entry(value)
+            return
+
+        yield from iter_txt(f)
+
+
+class SeenIds:
+    """Set of 64-bit id digests: a fraction of the memory of the id strings themselves."""
+
+    def __init__(self):
+        self._seen = set()
+
+    @staticmethod
+    def _digest(store: str, app_id: str) -> int:
+        h = hashlib.blake2b(f"{store}:{app_id}".encode("utf-8"), digest_size=8)
+        return int.from_bytes(h.digest(), "little")
+
+    def add(self, store: str, app_id: str) -> bool:
+        """Returns True if the id is new."""
+        d = self._digest(store, app_id)
+        if d in self._seen:
+            return False
+        self._seen.add(d)
+        return True
+
+
+def dedupe(entries):
+    """
+    Drops ids that already appeared in an earlier entry; an entry left with no
+    ids at all is skipped, so every app is fetched once.
+    """
+    seen = SeenIds()
+    for e in entries:
+        google = e.get("google", "")
+        apple = e.get("apple", "")
+        if google and not seen.add("google", google):
+            google = ""
+        if apple and not seen.add("apple", normalize_track_id(apple)):
+            apple = ""
+        if google or apple:
+            yield {"google": google, "apple": apple}
@@ -1,10 +1,25 @@
+import os
 import re
 import html
+import json
 import shutil
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
+import image_derivatives
+import metrics
+import locales
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 INPUT_XLSX = "apps.xlsx"
+INPUT_DATASET = "apps.jsonl"  # written by packages_parser next to apps.xlsx; preferred input
 CONTENT_DIR = Path("apps_content")
 
 OUT_DIR = Path("site")
@@ -12,6 +27,33 @@ ASSETS_DIR = OUT_DIR / "assets"
 OUTPUT_HTML = OUT_DIR / "index.html"
 OUTPUT_CSS = OUT_DIR / "styles.css"
 
+BUILD_MANIFEST = Path(".cache") / "site" / "manifest.json"
+CARD_TEMPLATE_VERSION = 2  # bump when render_card output changes
+
+# how assets get from apps_content/ into site/assets/
+#   copy: byte copy; hardlink: same inode; reflink: copy-on-write clone;
+#   auto: reflink, then hardlink, then copy
+PUBLISH_MODES = ("copy", "hardlink", "reflink", "auto")
+PUBLISH_WORKERS = 8  # threads publishing assets while cards are rendered
+
+# "static": every card in index.html; "paged": first PAGE_SIZE cards in index.html,
+# the whole catalogue in SITE_DATA, rendered in the browser while scrolling
+LAYOUTS = ("static", "paged")
+PAGE_SIZE = 48
+SITE_DATA = "apps.json"
+SITE_DATA_FIELDS = (
+    "key", "title", "genre", "installs", "release", "google_id", "apple_id",
+    "google_url", "apple_url", "icon", "screenshots",
+)
+# client-side search index over card["search"], written next to index.html
+SEARCH_INDEX = "search.json"
+SEARCH_WORD = re.compile(r"[^\W_]+")  # same as the runtime's /[\p{L}\p{N}]+/u
+# --icon-sprites: icons packed into atlases of up to SPRITE_MAX icons (1x and 2x),
+# published to ASSETS_DIR/SPRITES and referenced by CSS background offset
+SPRITES = "sprites"
+SPRITE_MAX = 256
+FICLONE = 0x40049409  # linux/fs.h
+
 PAGE_TITLE = "Serhii Tokman — Apps Portfolio"
 PAGE_H1 = "Apps I’ve Worked On"
 PAGE_SUBTITLE = (
@@ -35,23 +77,63 @@ def sanitize_title(title: str) -> str:
         sanitized = "_" + sanitized[1:]
     return sanitized
 
-def safe_copy(src: Path, dst: Path) -> bool:
+def reflink(src: Path, dst: Path):
+    """Copy-on-write clone (btrfs, XFS, ...); raises OSError where unsupported."""
+    if fcntl is None:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, "rb") as fs, open(dst, "wb") as fd:
+        fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+    shutil.copystat(src, dst)
+
+
+def publish_file(src: Path, dst: Path, mode: str = "copy"):
+    """
+    Puts src at dst using mode (see PUBLISH_MODES), falling back to a plain copy
+    across devices or where links/clones are unsupported. dst is replaced atomically.
+    """
+    if mode in ("hardlink", "auto"):
+        try:
+            if dst.exists() and os.path.samefile(src, dst):
+                return
+        except OSError:
+            pass
+
+    tmp = dst.with_name(f".{dst.name}.tmp")
+    try:
+        tmp.unlink()
+    except OSError:
+        pass
+
+    attempts = {
+        "copy": [],
+        "hardlink": [os.link],
+        "reflink": [reflink],
+        "auto": [reflink, os.link],
+    }[mode]
+    for publish in attempts:
+        try:
+            publish(src, tmp)
+            break
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    else:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+def safe_copy(src: Path, dst: Path, mode: str = "copy") -> bool:
     if not src.exists():
         return False
     dst.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(src, dst)
+    # never copy into dst in place: after a hardlink build it may share its inode
+    # with src or with a content-addressed blob in the asset store
+    publish_file(src, dst, mode)
     return True
 
 
-def normalize_track_id(x) -> str:
-    if x is None:
-        return ""
-    s = str(x).strip()
-    if s.endswith(".0"):
-        s = s[:-2]
-    s = re.sub(r"\D", "", s)
-    return s
-
 def is_url(s: str) -> bool:
     return isinstance(s, str) and (s.startswith("http://") or s.startswith("https://"))
 
@@ -64,13 +146,6 @@ def pick_column(df, *candidates):
             return c
     return None
 
-def row_str(r, col):
-    if not col:
-        return ""
-    v = r.get(col)
-    return "" if pd.isna(v) else str(v)
-
-
 def pretty_date(s: str) -> str:
     if not s:
         return ""
@@ -79,12 +154,72 @@ def pretty_date(s: str) -> str:
         return str(s)
     return f"{dt.strftime('%b')} {dt.day}, {dt.year}"
 
-def content_key_from_row(google_id: str, apple_id: str, title: str) -> str:
-    if google_id:
-        return google_id
-    if apple_id:
-        return f"apple_{apple_id}"
-    return sanitize_title(title) if title else "unknown"
+# The loaders prepare every card field as a whole column (one pass over the
+# catalogue per field) and only build plain dicts at the end.
+CARD_FIELDS = (
+    "key", "title", "genre", "installs", "release", "google_id", "apple_id",
+    "google_url", "apple_url", "search",
+)
+
+
+def str_column(df, col) -> pd.Series:
+    """Column as strings: "" for a missing column and for empty cells."""
+    if not col or col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    s = df[col]
+    return s.astype(str).where(s.notna(), "")
+
+
+def normalize_track_ids(s: pd.Series) -> pd.Series:
+    return s.str.strip().str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+
+
+def installs_to_int(s: pd.Series) -> pd.Series:
+    """'1,000,000+' -> 1000000; anything else -> 0."""
+    s = s.str.replace(",", "", regex=False).str.replace("+", "", regex=False).str.strip()
+    return pd.to_numeric(s.where(s.str.isdigit()), errors="coerce").fillna(0).astype("int64")
+
+
+def pretty_dates(s: pd.Series) -> pd.Series:
+    """pretty_date for a whole column. ISO dates (what packages_parser writes) are
+    parsed in one go; other values go through pretty_date once per distinct value."""
+    dt = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    out = (dt.dt.strftime("%b") + " " + dt.dt.day.astype("Int64").astype(str)
+           + ", " + dt.dt.year.astype("Int64").astype(str))
+    rest = dt.isna() & (s != "")
+    if rest.any():
+        out[rest] = s[rest].map({v: pretty_date(v) for v in s[rest].unique()})
+    return out.where(dt.notna() | rest, "")
+
+
+def content_keys(google_id: pd.Series, apple_id: pd.Series, title: pd.Series) -> pd.Series:
+    """google id, else apple_<track id>, else the sanitized title, else "unknown"."""
+    keys = pd.Series("unknown", index=title.index, dtype=object)
+    named = title != ""
+    keys[named] = title[named].map(sanitize_title)
+    keys = ("apple_" + apple_id).where(apple_id != "", keys)
+    return google_id.where(google_id != "", keys)
+
+
+def prepare_cards(title, genre, installs, release, google_id, apple_id, google_url, apple_url) -> list:
+    """Card dicts (CARD_FIELDS) from per-field string columns, in column order."""
+    google_id = google_id.str.strip()
+    apple_id = normalize_track_ids(apple_id)
+    columns = {
+        "key": content_keys(google_id, apple_id, title),
+        "title": title,
+        "genre": genre,
+        "installs": installs,
+        "release": pretty_dates(release),
+        "google_id": google_id,
+        "apple_id": apple_id,
+        "google_url": google_url,
+        "apple_url": apple_url,
+        "search": (title + " " + google_id + " " + apple_id + " " + genre).str.lower(),
+    }
+    values = [columns[name].tolist() for name in CARD_FIELDS]
+    return [dict(zip(CARD_FIELDS, row)) for row in zip(*values)]
+
 
 CSS = f"""
 :root {{
@@ -313,13 +448,86 @@ h1 {{
 }}
 """
 
-def main():
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+# appended to CSS by --icon-sprites, followed by one .sprite-N rule per atlas;
+# the border is an inset shadow so the background offsets stay whole icons
+SPRITE_CSS = f"""
+.icon .sprite {{
+  width: {ICON_SIZE}px;
+  height: {ICON_SIZE}px;
+  border-radius: 16px;
+  display: block;
+  background-color: #fff;
+  background-repeat: no-repeat;
+  box-shadow: inset 0 0 0 1px var(--border);
+}}
+"""
+
+_DEFAULT_PATHS = {
+    "INPUT_XLSX": INPUT_XLSX,
+    "INPUT_DATASET": INPUT_DATASET,
+    "CONTENT_DIR": CONTENT_DIR,
+    "OUT_DIR": OUT_DIR,
+    "BUILD_MANIFEST": BUILD_MANIFEST,
+}
+
+
+def use_locale(locale):
+    """
+    Points the build at a locale's files: apps.de-de.jsonl, apps_content/de-de/ ->
+    site/de-de/ (see locales). The default locale uses the original paths.
+    """
+    global INPUT_XLSX, INPUT_DATASET, CONTENT_DIR, OUT_DIR, ASSETS_DIR, OUTPUT_HTML, OUTPUT_CSS, BUILD_MANIFEST
+    suffix = locales.suffix(locale)
+    base, ext = os.path.splitext(_DEFAULT_PATHS["INPUT_XLSX"])
+    INPUT_XLSX = f"{base}{suffix}{ext}"
+    base, ext = os.path.splitext(_DEFAULT_PATHS["INPUT_DATASET"])
+    INPUT_DATASET = f"{base}{suffix}{ext}"
+    CONTENT_DIR = locales.subdir(_DEFAULT_PATHS["CONTENT_DIR"], locale)
+    OUT_DIR = locales.subdir(_DEFAULT_PATHS["OUT_DIR"], locale)
+    ASSETS_DIR = OUT_DIR / "assets"
+    OUTPUT_HTML = OUT_DIR / "index.html"
+    OUTPUT_CSS = OUT_DIR / "styles.css"
+    manifest = _DEFAULT_PATHS["BUILD_MANIFEST"]
+    BUILD_MANIFEST = locales.subdir(manifest.parent, locale) / manifest.name
+
+
+def load_cards(source=None):
+    """
+    Returns the card fields (dicts), sorted by installs. source is an apps.jsonl
+    dataset or an apps.xlsx workbook; by default the dataset is used when present.
+    """
+    if source is None:
+        source = INPUT_DATASET if Path(INPUT_DATASET).exists() else INPUT_XLSX
+    if str(source).lower().endswith(".xlsx"):
+        return load_cards_from_xlsx(source)
+    return load_cards_from_dataset(source)
+
+
+def load_cards_from_dataset(path):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+
+    df = pd.DataFrame.from_records(records)
+    installs_num = pd.to_numeric(str_column(df, "installs_num"), errors="coerce").fillna(0)
+    df = df.loc[installs_num.sort_values(ascending=False, kind="stable").index]
+
+    return prepare_cards(
+        title=str_column(df, "title"),
+        genre=str_column(df, "genre"),
+        installs=str_column(df, "installs"),
+        release=str_column(df, "release_date"),
+        google_id=str_column(df, "google_id"),
+        apple_id=str_column(df, "apple_id"),
+        google_url=str_column(df, "google_url"),
+        apple_url=str_column(df, "apple_url"),
+    )
 
-    OUTPUT_CSS.write_text(CSS.strip() + "\n", encoding="utf-8")
 
-    df = pd.read_excel(INPUT_XLSX, skiprows=1, engine="openpyxl").dropna(how="all")
+def load_cards_from_xlsx(path=INPUT_XLSX):
+    df = pd.read_excel(path, skiprows=1, engine="openpyxl").dropna(how="all")
 
     col_title = pick_column(df, "Title")
     col_genre = pick_column(df, "Genre")
@@ -336,84 +544,216 @@ def main():
         raise RuntimeError(f"Missing 'Title' column. Found: {list(df.columns)}")
 
     if col_installs:
-        def installs_to_int(x):
-            if pd.isna(x): return 0
-            s = str(x).replace(",", "").replace("+", "").strip()
-            return int(s) if s.isdigit() else 0
-        df["_installs_num"] = df[col_installs].apply(installs_to_int)
-        df = df.sort_values(by="_installs_num", ascending=False).drop(columns=["_installs_num"])
-
-    cards_html = []
-
-    missing_assets = 0
-
-    for _, r in df.iterrows():
-        title = row_str(r, col_title)
-        genre = row_str(r, col_genre)
-        installs = row_str(r, col_installs)
-        release = pretty_date(row_str(r, col_release))
-
-        apple_id = normalize_track_id(row_str(r, col_apple_id))
-        google_id = row_str(r, col_google_id).strip()
-
-        google_url = row_str(r, col_google_url)
-        apple_url = row_str(r, col_apple_url)
-
-        key = content_key_from_row(google_id, apple_id, title)
-        app_folder = CONTENT_DIR / key
-
-        icon_src = app_folder / "icon.png"
-        ss_srcs = [app_folder / f"screenshot{i}.png" for i in range(3)]
+        df["_installs_num"] = installs_to_int(str_column(df, col_installs))
+        df = df.sort_values(by="_installs_num", ascending=False, kind="stable").drop(columns=["_installs_num"])
+
+    return prepare_cards(
+        title=str_column(df, col_title),
+        genre=str_column(df, col_genre),
+        installs=str_column(df, col_installs),
+        release=str_column(df, col_release),
+        google_id=str_column(df, col_google_id),
+        apple_id=str_column(df, col_apple_id),
+        google_url=str_column(df, col_google_url),
+        apple_url=str_column(df, col_apple_url),
+    )
 
-        icon_dst = ASSETS_DIR / key / "icon.png"
-        ss_dsts = [ASSETS_DIR / key / f"screenshot{i}.png" for i in range(3)]
 
-        icon_rel = ""
-        if safe_copy(icon_src, icon_dst):
-            icon_rel = icon_dst.relative_to(OUT_DIR).as_posix()
-        else:
-            missing_assets += 1
+def derivative_jobs(cards, icons=True):
+    """image_derivatives jobs for every existing icon/screenshot: (src, width, height, fit)."""
+    jobs = []
+    for card in cards:
+        for i, (src, _) in enumerate(card_assets(card["key"])):
+            if not src.exists() or (i == 0 and not icons):
+                continue
+            if i == 0:
+                jobs.append((src, ICON_SIZE, ICON_SIZE, image_derivatives.FIT_CONTAIN))
+            else:
+                jobs.append((src, SCREENSHOT_W, SCREENSHOT_H, image_derivatives.FIT_COVER))
+    return jobs
+
+
+def derivative_pairs(src: Path, dst: Path, derived: dict, fmt: str):
+    """(src, dst) pairs that publish the 1x/2x variants of src instead of the original."""
+    d = derived[str(src)]
+    return [
+        (Path(d["1x"]), dst.with_name(f"{dst.stem}.{fmt}")),
+        (Path(d["2x"]), dst.with_name(f"{dst.stem}@2x.{fmt}")),
+    ]
+
+
+def sprite_sheets(cards, fmt, publish_one) -> tuple:
+    """
+    Packs the existing icons of cards into atlases of SPRITE_MAX icons
+    (image_derivatives.build_sprite, cached by member hashes) and publishes them
+    with publish_one(src, dst) -> rel. Icons are packed in key order, not card
+    order, so a card moving in the sort (installs) doesn't shift later cells.
+    Returns ({key: [sheet, x, y]}, css) for the icons that made it into a published sheet.
+    """
+    icons = [(key, CONTENT_DIR / key / "icon.png") for key in sorted({card["key"] for card in cards})]
+    icons = [(key, src) for key, src in icons if src.exists()]
+    sprites = {}
+    rules = [SPRITE_CSS] if icons else []
+    for n, start in enumerate(range(0, len(icons), SPRITE_MAX)):
+        chunk = icons[start:start + SPRITE_MAX]
+        sheet = image_derivatives.build_sprite([src for _, src in chunk], ICON_SIZE, fmt)
+        dst = ASSETS_DIR / SPRITES / f"{sheet['digest'][:16]}.{fmt}"
+        rel1 = publish_one(Path(sheet["1x"]), dst)
+        rel2 = publish_one(Path(sheet["2x"]), dst.with_name(f"{dst.stem}@2x.{fmt}"))
+        if not (rel1 and rel2):
+            continue
+        rules.append(
+            f".sprite-{n} {{ background-image: url('{rel1}'); "
+            f"background-image: -webkit-image-set(url('{rel1}') 1x, url('{rel2}') 2x); "
+            f"background-image: image-set(url('{rel1}') 1x, url('{rel2}') 2x); "
+            f"background-size: {sheet['width']}px {sheet['height']}px; }}\n"
+        )
+        for key, src in chunk:
+            cell = sheet["cells"].get(str(src))
+            if cell:
+                sprites[key] = [n, *cell]
+    return sprites, "".join(rules)
+
+
+def sprite_html(sprite) -> str:
+    n, x, y = sprite
+    return f"<span class='sprite sprite-{n}' style='background-position:{-x}px {-y}px'></span>"
+
+
+def card_assets(key: str):
+    """(src, dst) pairs for the icon and screenshots of one card."""
+    app_folder = CONTENT_DIR / key
+    pairs = [(app_folder / "icon.png", ASSETS_DIR / key / "icon.png")]
+    pairs += [(app_folder / f"screenshot{i}.png", ASSETS_DIR / key / f"screenshot{i}.png") for i in range(3)]
+    return pairs
+
+
+def img_attrs(rel: str, variants: dict) -> str:
+    """src plus, for derivative images, srcset and intrinsic width/height."""
+    v = variants.get(rel) if variants else None
+    if not v:
+        return f"src='{esc(rel)}'"
+    return (
+        f"src='{esc(rel)}' srcset='{esc(rel)} 1x, {esc(v['2x'])} 2x' "
+        f"width='{v['width']}' height='{v['height']}'"
+    )
 
-        ss_rel = []
-        for src, dst in zip(ss_srcs, ss_dsts):
-            if safe_copy(src, dst):
-                ss_rel.append(dst.relative_to(OUT_DIR).as_posix())
 
-        screenshots_html = (
-            "<div class='shots'>"
-            + "".join(
-                [f"<a class='shot' href='{esc(p)}' target='_blank' rel='noopener noreferrer'><img src='{esc(p)}' alt='' loading='lazy'/></a>"
-                 for p in ss_rel]
-            )
-            + "</div>"
-        ) if ss_rel else "<div class='shots empty'>No screenshots</div>"
-
-        buttons = []
-        if is_url(google_url):
-            buttons.append(f"<a class='btn' href='{esc(google_url)}' target='_blank' rel='noopener noreferrer'>Google Play</a>")
-        if is_url(apple_url):
-            buttons.append(f"<a class='btn apple' href='{esc(apple_url)}' target='_blank' rel='noopener noreferrer'>App Store</a>")
-        buttons_html = "".join(buttons)
-
-        ids_html = []
-        if google_id:
-            ids_html.append(f"<div>Google: {esc(google_id)}</div>")
-        if apple_id:
-            ids_html.append(f"<div>Apple: {esc(apple_id)}</div>")
-
-        chips = []
-        if genre:
-            chips.append(f"<span class='chip'>{esc(genre)}</span>")
-        if installs:
-            chips.append(f"<span class='chip'>{esc(installs)} installs</span>")
-        if release:
-            chips.append(f"<span class='chip'>Released: {esc(release)}</span>")
-
-        cards_html.append(f"""
-<article class="card" data-search="{esc((title+' '+google_id+' '+apple_id+' '+genre).lower())}">
+def largest(rel: str, variants: dict) -> str:
+    """The largest published variant of rel (what a screenshot links to): 2x for derivatives."""
+    v = variants.get(rel) if variants else None
+    return v["2x"] if v else rel
+
+
+def img_spec(rel: str, variants: dict):
+    """SITE_DATA image: the path, or [path, 2x path, width, height] for derivatives."""
+    v = variants.get(rel) if variants else None
+    return [rel, v["2x"], v["width"], v["height"]] if v else rel
+
+
+def card_row(card: dict, icon_rel: str, ss_rel: list, variants: dict = None, sprite=None) -> list:
+    """
+    One SITE_DATA row (SITE_DATA_FIELDS order) with the same content as render_card;
+    a sprite icon is {"sprite": [sheet, x, y]}.
+    """
+    return [
+        card["key"], card["title"], card["genre"], card["installs"], card["release"],
+        card["google_id"], card["apple_id"],
+        card["google_url"] if is_url(card["google_url"]) else "",
+        card["apple_url"] if is_url(card["apple_url"]) else "",
+        {"sprite": sprite} if sprite else img_spec(icon_rel, variants) if icon_rel else "",
+        [img_spec(p, variants) for p in ss_rel],
+    ]
+
+
+def delta_encode(ids: list) -> list:
+    prev = 0
+    out = []
+    for i in ids:
+        out.append(i - prev)
+        prev = i
+    return out
+
+
+def build_search_index(cards) -> dict:
+    """
+    SEARCH_INDEX content: the distinct words of all cards' search strings,
+    sorted like JS compares strings (UTF-16), the cards of every word, and the
+    words containing every trigram. Id lists are ascending and delta-encoded.
+    """
+    postings = {}
+    for i, card in enumerate(cards):
+        for word in set(SEARCH_WORD.findall(card["search"])):
+            postings.setdefault(word, []).append(i)
+    words = sorted(postings, key=lambda w: w.encode("utf-16-be"))
+
+    grams = {}
+    for w, word in enumerate(words):
+        for gram in {word[j:j + 3] for j in range(len(word) - 2)}:
+            grams.setdefault(gram, []).append(w)
+
+    return {
+        "size": len(cards),
+        "words": words,
+        "cards": [delta_encode(postings[word]) for word in words],
+        "grams": {gram: delta_encode(ids) for gram, ids in sorted(grams.items())},
+    }
+
+
+def render_card(card: dict, icon_rel: str, ss_rel: list, variants: dict = None, sprite=None) -> str:
+    """sprite: [sheet, x, y] of the icon in a sprite atlas, rendered instead of icon_rel."""
+    title = card["title"]
+    genre = card["genre"]
+    installs = card["installs"]
+    release = card["release"]
+    google_id = card["google_id"]
+    apple_id = card["apple_id"]
+    google_url = card["google_url"]
+    apple_url = card["apple_url"]
+    search = card["search"]
+
+    if sprite:
+        icon_html = sprite_html(sprite)
+    elif icon_rel:
+        icon_html = "<img " + img_attrs(icon_rel, variants) + " alt='' loading='lazy'/>"
+    else:
+        icon_html = "<div class='icon-ph'></div>"
+
+    screenshots_html = (
+        "<div class='shots'>"
+        + "".join(
+            [f"<a class='shot' href='{esc(largest(p, variants))}' target='_blank' rel='noopener noreferrer'><img {img_attrs(p, variants)} alt='' loading='lazy'/></a>"
+             for p in ss_rel]
+        )
+        + "</div>"
+    ) if ss_rel else "<div class='shots empty'>No screenshots</div>"
+
+    buttons = []
+    if is_url(google_url):
+        buttons.append(f"<a class='btn' href='{esc(google_url)}' target='_blank' rel='noopener noreferrer'>Google Play</a>")
+    if is_url(apple_url):
+        buttons.append(f"<a class='btn apple' href='{esc(apple_url)}' target='_blank' rel='noopener noreferrer'>App Store</a>")
+    buttons_html = "".join(buttons)
+
+    ids_html = []
+    if google_id:
+        ids_html.append(f"<div>Google: {esc(google_id)}</div>")
+    if apple_id:
+        ids_html.append(f"<div>Apple: {esc(apple_id)}</div>")
+
+    chips = []
+    if genre:
+        chips.append(f"<span class='chip'>{esc(genre)}</span>")
+    if installs:
+        chips.append(f"<span class='chip'>{esc(installs)} installs</span>")
+    if release:
+        chips.append(f"<span class='chip'>Released: {esc(release)}</span>")
+
+    return f"""
+<article class="card" data-search="{esc(search)}">
   <div class="meta">
     <div class="icon">
-      {"<img src='"+esc(icon_rel)+"' alt='' loading='lazy'/>" if icon_rel else "<div class='icon-ph'></div>"}
+      {icon_html}
     </div>
     <div class="info">
       <h2 class="title">{esc(title)}</h2>
@@ -424,14 +764,261 @@ def main():
   </div>
   {screenshots_html}
 </article>
-""")
+"""
+
+
+# Search runtime over SEARCH_INDEX, shared by both layouts. A query is split
+# into words (all must match): words shorter than 3 characters match word
+# prefixes (binary search over the sorted words), longer ones any word that
+# contains them (intersection of the trigram lists, then a substring check).
+# query() returns ascending card indices, null for "no filter", or undefined
+# while the index is not loaded (pages opened from disk can't fetch it), in
+# which case the layouts fall back to scanning the search strings.
+SEARCH_SCRIPT = """
+  const search = (() => {
+    const WORD = /[\\p{L}\\p{N}]+/gu;
+    const CACHE_SIZE = 64;
+    const cache = new Map();
+    let words = null, offsets, flat, grams, mark, stamp = 0, loading = null;
+
+    function gram(g) {
+      let a = grams[g];
+      if (a && !(a instanceof Int32Array)) {
+        const out = new Int32Array(a.length);
+        for (let i = 0, v = 0; i < a.length; i++) out[i] = v += a[i];
+        a = grams[g] = out;
+      }
+      return a;
+    }
+
+    function lowerBound(w) {
+      let lo = 0, hi = words.length;
+      while (lo < hi) { const mid = (lo + hi) >> 1; if (words[mid] < w) lo = mid + 1; else hi = mid; }
+      return lo;
+    }
+
+    function intersect(a, b) {
+      const out = new Int32Array(Math.min(a.length, b.length));
+      let n = 0;
+      for (let i = 0, j = 0; i < a.length && j < b.length;) {
+        if (a[i] < b[j]) i++; else if (a[i] > b[j]) j++; else { out[n++] = a[i]; i++; j++; }
+      }
+      return out.subarray(0, n);
+    }
+
+    // ids of the words containing w (3+ characters), from the trigram lists
+    function wordsContaining(w, chars) {
+      const lists = [];
+      for (let i = 0; i + 3 <= chars.length; i++) {
+        const ids = gram(chars.slice(i, i + 3).join(''));
+        if (!ids) return [];
+        lists.push(ids);
+      }
+      lists.sort((a, b) => a.length - b.length);
+      let ids = lists[0];
+      for (let i = 1; i < lists.length && ids.length; i++) ids = intersect(ids, lists[i]);
+      if (chars.length === 3) return ids;  // a trigram list is exact
+      const out = [];
+      for (let i = 0; i < ids.length; i++) if (words[ids[i]].includes(w)) out.push(ids[i]);
+      return out;
+    }
+
+    // ascending cards matching one query word; typing mostly changes only the last word
+    function cardsMatching(w) {
+      let hits = cache.get(w);
+      if (hits) {
+        cache.delete(w);
+        cache.set(w, hits);
+        return hits;
+      }
+      stamp++;
+      let n = 0;
+      const add = (from, to) => {
+        for (let j = offsets[from]; j < offsets[to]; j++) if (mark[flat[j]] !== stamp) { mark[flat[j]] = stamp; n++; }
+      };
+      const chars = Array.from(w);
+      if (chars.length < 3) add(lowerBound(w), lowerBound(w + '\\uffff'));  // words are sorted: one range
+      else for (const i of wordsContaining(w, chars)) add(i, i + 1);
+
+      hits = new Int32Array(n);
+      for (let c = 0, j = 0; j < n; c++) if (mark[c] === stamp) hits[j++] = c;
+      if (cache.size >= CACHE_SIZE) cache.delete(cache.keys().next().value);
+      cache.set(w, hits);
+      return hits;
+    }
+
+    function query(term) {
+      if (!words) return undefined;
+      const terms = term.toLowerCase().match(WORD);
+      if (!terms) return null;
+      const lists = terms.map(cardsMatching).sort((a, b) => a.length - b.length);
+      let hits = lists[0];
+      for (let i = 1; i < lists.length && hits.length; i++) hits = intersect(hits, lists[i]);
+      return hits;
+    }
+
+    function load(url) {
+      if (!url) return Promise.resolve(false);
+      loading = loading || fetch(url)
+        .then(r => r.ok ? r.json() : Promise.reject(r.status))
+        .then(ix => {
+          // the cards of word i are flat[offsets[i]:offsets[i + 1]]
+          offsets = new Int32Array(ix.cards.length + 1);
+          ix.cards.forEach((a, i) => { offsets[i + 1] = offsets[i] + a.length; });
+          flat = new Int32Array(offsets[ix.cards.length]);
+          ix.cards.forEach((a, i) => { for (let j = 0, v = 0, o = offsets[i]; j < a.length; j++) flat[o + j] = v += a[j]; });
+          words = ix.words;
+          grams = ix.grams;
+          mark = new Uint32Array(ix.size);
+          return true;
+        })
+        .catch(() => false);
+      return loading;
+    }
+
+    return {query, load};
+  })();
+"""
+
+
+STATIC_SCRIPT = """
+  const q = document.getElementById('q');
+  const cards = Array.from(document.querySelectorAll('.card'));
+  const count = document.getElementById('count');
+  const visible = new Uint8Array(cards.length).fill(1);
+
+  function update() {
+    const term = (q.value || '').toLowerCase().trim();
+    const hits = term ? search.query(term) : null;
+    const want = new Uint8Array(cards.length);
+    if (hits === null) want.fill(1);
+    else if (hits) for (const i of hits) want[i] = 1;
+    else cards.forEach((c, i) => { want[i] = (c.getAttribute('data-search') || '').includes(term) ? 1 : 0; });
+
+    let shown = 0;
+    for (let i = 0; i < cards.length; i++) {
+      if (want[i] !== visible[i]) cards[i].style.display = want[i] ? '' : 'none';
+      shown += want[i];
+    }
+    visible.set(want);
+    count.textContent = shown + ' shown';
+  }
 
+  let frame = 0;
+  q.addEventListener('input', () => { cancelAnimationFrame(frame); frame = requestAnimationFrame(update); });
+  q.addEventListener('focus', () => search.load(q.dataset.index).then(ok => ok && q.value && update()), {once: true});
+  update();
+"""
+
+# Paged layout: the grid starts with the first page of cards (server-rendered),
+# the full catalogue comes from SITE_DATA (rows in SITE_DATA_FIELDS order) and
+# further cards are built from it as the user scrolls. Search filters the rows
+# (SEARCH_SCRIPT), not the DOM, and re-renders only the first page of matches.
+PAGED_SCRIPT = """
+  const q = document.getElementById('q');
+  const grid = document.getElementById('grid');
+  const count = document.getElementById('count');
+  const PAGE = +grid.dataset.page;
+  const MARGIN = 800;
+  const ESC = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'};
+  const esc = s => String(s == null ? '' : s).replace(/[&<>"']/g, c => ESC[c]);
+  const sentinel = document.createElement('div');
+  grid.after(sentinel);
+
+  let rows = [], hay = null, matches = null, shown = grid.children.length;
+  count.textContent = grid.dataset.total + ' shown';
+
+  function imgAttrs(spec) {
+    if (typeof spec === 'string') return `src='${esc(spec)}'`;
+    return `src='${esc(spec[0])}' srcset='${esc(spec[0])} 1x, ${esc(spec[1])} 2x' width='${spec[2]}' height='${spec[3]}'`;
+  }
+
+  function iconHtml(icon) {
+    if (!icon) return `<div class='icon-ph'></div>`;
+    if (icon.sprite) {
+      const [n, x, y] = icon.sprite;
+      return `<span class='sprite sprite-${n}' style='background-position:${-x}px ${-y}px'></span>`;
+    }
+    return `<img ${imgAttrs(icon)} alt='' loading='lazy'/>`;
+  }
+
+  function card(a) {
+    const [key, title, genre, installs, release, gid, aid, gurl, aurl, icon, shots] = a;
+    const chips = [];
+    if (genre) chips.push(`<span class='chip'>${esc(genre)}</span>`);
+    if (installs) chips.push(`<span class='chip'>${esc(installs)} installs</span>`);
+    if (release) chips.push(`<span class='chip'>Released: ${esc(release)}</span>`);
+    const ids = (gid ? `<div>Google: ${esc(gid)}</div>` : '') + (aid ? `<div>Apple: ${esc(aid)}</div>` : '');
+    const buttons =
+      (gurl ? `<a class='btn' href='${esc(gurl)}' target='_blank' rel='noopener noreferrer'>Google Play</a>` : '') +
+      (aurl ? `<a class='btn apple' href='${esc(aurl)}' target='_blank' rel='noopener noreferrer'>App Store</a>` : '');
+    const shotsHtml = shots.length
+      ? `<div class='shots'>${shots.map(s => `<a class='shot' href='${esc(typeof s === 'string' ? s : s[1])}' target='_blank' rel='noopener noreferrer'><img ${imgAttrs(s)} alt='' loading='lazy'/></a>`).join('')}</div>`
+      : `<div class='shots empty'>No screenshots</div>`;
+    return `<article class="card"><div class="meta"><div class="icon">${iconHtml(icon)}</div>` +
+      `<div class="info"><h2 class="title">${esc(title)}</h2><div class="sub">${chips.length ? chips.join('') : `<span class='chip'>—</span>`}</div>` +
+      `<div class="ids">${ids}</div><div class="actions">${buttons}</div></div></div>${shotsHtml}</article>`;
+  }
+
+  function fill() {
+    while (matches && shown < matches.length && sentinel.getBoundingClientRect().top < innerHeight + MARGIN) {
+      const end = Math.min(shown + PAGE, matches.length);
+      let html = '';
+      for (let i = shown; i < end; i++) html += card(rows[matches[i]]);
+      grid.insertAdjacentHTML('beforeend', html);
+      shown = end;
+    }
+  }
+
+  function filter() {
+    const term = (q.value || '').toLowerCase().trim();
+    const hits = term ? search.query(term) : null;
+    if (hits === null) matches = rows.map((_, i) => i);
+    else if (hits) matches = hits;
+    else {
+      hay = hay || rows.map(a => (a[1] + ' ' + a[5] + ' ' + a[6] + ' ' + a[2]).toLowerCase());
+      matches = [];
+      for (let i = 0; i < rows.length; i++) if (hay[i].includes(term)) matches.push(i);
+    }
+    grid.textContent = '';
+    shown = 0;
+    count.textContent = matches.length + ' shown';
+    fill();
+  }
+
+  let frame = 0;
+  q.addEventListener('input', () => { cancelAnimationFrame(frame); frame = requestAnimationFrame(() => matches && filter()); });
+  new IntersectionObserver(fill, {rootMargin: MARGIN + 'px'}).observe(sentinel);
+  q.addEventListener('focus', () => search.load(q.dataset.index).then(ok => ok && matches && q.value && filter()), {once: true});
+
+  fetch(grid.dataset.src).then(r => r.json()).then(data => {
+    rows = data.rows;
+    matches = rows.map((_, i) => i);
+    if (q.value) filter(); else fill();
+  });
+"""
+
+
+def render_page_parts(data=None, index_url=None) -> tuple:
+    """
+    The page around the cards, as (head, tail).
+    data: None for the static layout (every card inline), or (data_url, total)
+    for the paged layout, where the page only holds the first page of cards.
+    index_url: SEARCH_INDEX url for the search box (without it, search scans the cards).
+    """
     links_html = "".join(
         f"<a class='link-pill' href='{esc(url)}' target='_blank' rel='noopener noreferrer'>{esc(label)}</a>"
         for label, url in PAGE_LINKS
     )
-
-    page = f"""<!doctype html>
+    if data is None:
+        grid_attrs, script = "", STATIC_SCRIPT
+    else:
+        data_url, total = data
+        grid_attrs = f" data-src='{esc(data_url)}' data-total='{total}' data-page='{PAGE_SIZE}'"
+        script = PAGED_SCRIPT
+    index_attr = f" data-index='{esc(index_url)}'" if index_url else ""
+
+    head = f"""<!doctype html>
 <html>
 <head>
   <meta charset="utf-8"/>
@@ -449,43 +1036,350 @@ def main():
     </header>
 
     <div class="toolbar">
-      <input id="q" class="search" placeholder="Search by title / ids / genre..." />
+      <input id="q" class="search" placeholder="Search by title / ids / genre..."{index_attr} />
       <div id="count" class="count"></div>
     </div>
 
-    <section id="grid" class="grid">
-      {''.join(cards_html)}
+    <section id="grid" class="grid"{grid_attrs}>
+      """
+    tail = f"""
     </section>
 
     
   </div>
 
-<script>
-  const q = document.getElementById('q');
-  const cards = Array.from(document.querySelectorAll('.card'));
-  const count = document.getElementById('count');
-
-  function update() {{
-    const term = (q.value || '').toLowerCase().trim();
-    let shown = 0;
-    for (const c of cards) {{
-      const hay = c.getAttribute('data-search') || '';
-      const ok = !term || hay.includes(term);
-      c.style.display = ok ? '' : 'none';
-      if (ok) shown++;
-    }}
-    count.textContent = shown + ' shown';
-  }}
-
-  q.addEventListener('input', update);
-  update();
-</script>
+<script>{SEARCH_SCRIPT}{script}</script>
 </body>
 </html>
 """
-    OUTPUT_HTML.write_text(page, encoding="utf-8")
-    print(f"Written: {OUTPUT_HTML}")
+    return head, tail
+
+
+def render_page(cards_html, data=None, index_url=None) -> str:
+    head, tail = render_page_parts(data, index_url)
+    return head + "".join(cards_html) + tail
+
+
+def load_manifest() -> dict:
+    try:
+        manifest = json.loads(BUILD_MANIFEST.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"cards": {}, "assets": {}}
+    if manifest.get("version") != CARD_TEMPLATE_VERSION:
+        # template changed: cached card html is useless, asset records still hold
+        manifest["cards"] = {}
+    manifest.setdefault("cards", {})
+    manifest.setdefault("assets", {})
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    manifest["version"] = CARD_TEMPLATE_VERSION
+    BUILD_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    tmp = BUILD_MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(BUILD_MANIFEST)
+
+
+def publish_incremental(src: Path, dst: Path, old_assets: dict, new_assets: dict, mode: str = "copy") -> bool:
+    """
+    safe_copy that skips unchanged files: same size+mtime as last build, or same
+    content hash. Records the published file in new_assets. Returns True if dst is in place.
+    """
+    try:
+        st = src.stat()
+    except OSError:
+        return False
+
+    rel = dst.relative_to(OUT_DIR).as_posix()
+    prev = old_assets.get(rel)
+    if prev and dst.exists() and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+        new_assets[rel] = prev
+        return True
+
+    digest = image_derivatives.file_sha256(src)
+    if not (prev and dst.exists() and prev["sha256"] == digest):
+        safe_copy(src, dst, mode)
+    new_assets[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return True
+
+
+def remove_stale_assets(old_assets: dict, new_assets: dict):
+    for rel in set(old_assets) - set(new_assets):
+        path = OUT_DIR / rel
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        try:
+            path.parent.rmdir()  # only succeeds once the app folder is empty
+        except OSError:
+            pass
+
+
+def card_inputs_hash(card: dict, assets: list) -> str:
+    payload = json.dumps([card, assets], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_versioned(name: str, content) -> str:
+    """Writes content as compact JSON to OUT_DIR/name; returns its url with a content-hash query string."""
+    payload = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+    (OUT_DIR / name).write_text(payload, encoding="utf-8")
+    print(f"Written: {OUT_DIR / name}")
+    return f"{name}?v={hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]}"
+
+
+class SiteWriter:
+    """
+    Output stage of the build, fed one card at a time in page order.
+    static layout: index.html is streamed to disk as cards come in.
+    paged layout: the SITE_DATA rows are streamed instead, and index.html (only
+    the first PAGE_SIZE cards) is written on close, once the data url is known.
+    Files replace the previous build's on close, so a failed build leaves it intact.
+    """
+
+    def __init__(self, layout="static", index_url=None):
+        self.layout = layout
+        self.index_url = index_url
+        self.first_page = []
+        self.rows = 0
+        self.page = self.data = None
+        if layout == "static":
+            head, self.tail = render_page_parts(None, index_url)
+            self.page_tmp = OUTPUT_HTML.with_name(f"{OUTPUT_HTML.name}.tmp")
+            self.page = open(self.page_tmp, "w", encoding="utf-8")
+            self.page.write(head)
+        else:
+            self.data_file = OUT_DIR / SITE_DATA
+            self.data_tmp = self.data_file.with_name(f"{SITE_DATA}.tmp")
+            self.data = open(self.data_tmp, "w", encoding="utf-8")
+            self.data_hash = hashlib.sha256()
+            self.write_data(f'{{"fields":{json.dumps(SITE_DATA_FIELDS, separators=(",", ":"))},"rows":[')
+
+    def wants_html(self) -> bool:
+        """False once the paged layout has its first page (later cards are only rows)."""
+        return self.page is not None or len(self.first_page) < PAGE_SIZE
+
+    def write_data(self, text: str):
+        self.data.write(text)
+        self.data_hash.update(text.encode("utf-8"))
+
+    def write(self, card_html=None, row=None):
+        with metrics.timer("site.write"):
+            if self.page is not None:
+                self.page.write(card_html)
+                return
+            if card_html is not None:
+                self.first_page.append(card_html)
+            self.write_data(("," if self.rows else "") + json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            self.rows += 1
+
+    def close(self):
+        with metrics.timer("site.write"):
+            data = None
+            if self.page is not None:
+                self.page.write(self.tail)
+                self.page.close()
+                os.replace(self.page_tmp, OUTPUT_HTML)
+            else:
+                self.write_data("]}")
+                self.data.close()
+                os.replace(self.data_tmp, self.data_file)
+                print(f"Written: {self.data_file}")
+                data = (f"{SITE_DATA}?v={self.data_hash.hexdigest()[:12]}", self.rows)
+                OUTPUT_HTML.write_text(render_page(self.first_page, data, self.index_url), encoding="utf-8")
+        print(f"Written: {OUTPUT_HTML}")
+
+
+def publish_cards(cards, publish_assets, workers=PUBLISH_WORKERS):
+    """
+    Runs publish_assets(card) -> (published, variants) on a thread pool and yields
+    (card, published, variants) in card order. At most 2 * workers cards are in
+    flight, so publishing runs ahead of rendering without holding the catalogue.
+    """
+    if workers <= 1:
+        for card in cards:
+            yield (card, *publish_assets(card))
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for card in cards:
+            pending.append((card, pool.submit(publish_assets, card)))
+            if len(pending) >= workers * 2:
+                card, future = pending.popleft()
+                yield (card, *future.result())
+        while pending:
+            card, future = pending.popleft()
+            yield (card, *future.result())
+
+
+def main(incremental=False, publish="copy", derivatives=None, workers=None, source=None, layout="static",
+         publish_workers=PUBLISH_WORKERS, icon_sprites=False):
+    """
+    derivatives: None to publish original images, or an image_derivatives format
+    ("webp"/"avif") to publish resized 1x/2x variants with srcset.
+    layout: see LAYOUTS.
+    publish_workers: threads publishing assets while cards are rendered (1: inline).
+    icon_sprites: pack icons into sprite atlases (see SPRITES) instead of one image per card.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unsupported layout: {layout}")
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+
+    with metrics.timer("site.load"):
+        cards = load_cards(source)
+    metrics.incr("site.cards", len(cards))
+
+    derived = {}
+    if derivatives:
+        with metrics.timer("site.derivatives"):
+            derived = image_derivatives.build_all(derivative_jobs(cards, icons=not icon_sprites), workers, fmt=derivatives)
+
+    with metrics.timer("site.search_index"):
+        index_url = write_versioned(SEARCH_INDEX, build_search_index(cards))
+
+    manifest = load_manifest() if incremental else {"cards": {}, "assets": {}}
+    old_assets = manifest["assets"]
+    new_assets = {}
+    old_cards = manifest["cards"]
+    new_cards = {}
+    rendered = 0
+
+    missing_assets = 0
+
+    def publish_one(src, dst):
+        with metrics.timer("site.publish"):
+            if incremental:
+                ok = publish_incremental(src, dst, old_assets, new_assets, publish)
+            else:
+                ok = safe_copy(src, dst, publish)
+        return dst.relative_to(OUT_DIR).as_posix() if ok else ""
+
+    sprites, sprite_css = {}, ""
+    if icon_sprites:
+        with metrics.timer("site.sprites"):
+            sprites, sprite_css = sprite_sheets(cards, derivatives or "png", publish_one)
+    OUTPUT_CSS.write_text(CSS.strip() + "\n" + sprite_css, encoding="utf-8")
+
+    def publish_assets(card):
+        published = []
+        variants = {}
+        for i, (src, dst) in enumerate(card_assets(card["key"])):
+            if i == 0 and card["key"] in sprites:
+                published.append("")
+                continue
+            if str(src) not in derived:
+                published.append(publish_one(src, dst))
+                continue
+            (src1, dst1), (src2, dst2) = derivative_pairs(src, dst, derived, derivatives)
+            rel1, rel2 = publish_one(src1, dst1), publish_one(src2, dst2)
+            published.append(rel1)
+            if rel1 and rel2:
+                d = derived[str(src)]
+                variants[rel1] = {"2x": rel2, "width": d["width"], "height": d["height"]}
+        return published, variants
+
+    writer = SiteWriter(layout, index_url)
+    for card, published, variants in publish_cards(cards, publish_assets, publish_workers):
+        icon_rel = published[0]
+        sprite = sprites.get(card["key"])
+        if not icon_rel and not sprite:
+            missing_assets += 1
+        ss_rel = [p for p in published[1:] if p]
+
+        row = card_row(card, icon_rel, ss_rel, variants, sprite) if layout == "paged" else None
+        if not writer.wants_html():
+            writer.write(row=row)
+            continue
+
+        if not incremental:
+            with metrics.timer("site.render"):
+                writer.write(render_card(card, icon_rel, ss_rel, variants, sprite), row)
+            continue
+
+        assets = [new_assets.get(p, {}).get("sha256", "") for p in published] + [variants]
+        inputs = card_inputs_hash(card, assets + [sprite] if sprite else assets)
+        cached = old_cards.get(card["key"])
+        if cached and cached["inputs"] == inputs:
+            card_html = cached["html"]
+        else:
+            with metrics.timer("site.render"):
+                card_html = render_card(card, icon_rel, ss_rel, variants, sprite)
+            rendered += 1
+        new_cards[card["key"]] = {"inputs": inputs, "html": card_html}
+        writer.write(card_html, row)
+    writer.close()
+
+    if incremental:
+        remove_stale_assets(old_assets, new_assets)
+        save_manifest({"cards": new_cards, "assets": new_assets})
+        print(f"Incremental build: {rendered}/{len(cards)} cards re-rendered")
+
     print(f"Written: {OUTPUT_CSS}")
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(usage="python html_creator.py [options]")
+    parser.add_argument(
+        "--input", default=None,
+        help=f"{INPUT_DATASET} or {INPUT_XLSX} (default: {INPUT_DATASET} if it exists)",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help=f"re-render only changed cards and re-copy only changed assets (state in {BUILD_MANIFEST})",
+    )
+    parser.add_argument(
+        "--publish", choices=PUBLISH_MODES, default="copy",
+        help="how assets are published into site/assets (links fall back to copy across devices)",
+    )
+    parser.add_argument(
+        "--publish-workers", type=int, default=PUBLISH_WORKERS, metavar="N",
+        help="threads publishing assets while cards are rendered (1: publish inline)",
+    )
+    parser.add_argument(
+        "--derivatives", choices=image_derivatives.FORMATS, default=None,
+        help="publish resized 1x/2x icons and screenshots in this format instead of the originals",
+    )
+    parser.add_argument(
+        "--icon-sprites", action="store_true",
+        help=f"pack icons into sprite atlases of up to {SPRITE_MAX} icons (1x/2x, cached in "
+             f"{image_derivatives.SPRITES_DIR}) instead of one request per card",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="processes used to encode derivatives (default: CPU count)",
+    )
+    parser.add_argument(
+        "--metrics", default=str(metrics.default_path("html_creator")), metavar="PATH",
+        help=f"where build timings are written as JSON (set {metrics.PROFILE_ENV}=1 to also profile the build)",
+    )
+    parser.add_argument(
+        "--layout", choices=LAYOUTS, default="static",
+        help=f"static: all cards in index.html; paged: first {PAGE_SIZE} cards plus {SITE_DATA}, "
+             f"the rest is rendered in the browser while scrolling (large catalogues)",
+    )
+    parser.add_argument(
+        "--locales", type=locales.parse_locales, default=[locales.DEFAULT_LOCALE], metavar="COUNTRY:LANG,...",
+        help="build one site per locale fetched by runner.py --locales (us:en -> site/, de:de -> site/de-de/)",
+    )
+    args = parser.parse_args(argv)
+    if args.input and len(args.locales) > 1:
+        parser.error("--input takes a single locale")
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with metrics.profiled("html_creator"):
+        for locale in args.locales:
+            use_locale(locale)
+            main(
+                incremental=args.incremental, publish=args.publish,
+                derivatives=args.derivatives, workers=args.workers, source=args.input,
+                layout=args.layout, publish_workers=args.publish_workers,
+                icon_sprites=args.icon_sprites,
+            )
+    metrics.write(args.metrics)
@@ -0,0 +1,149 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import rate_limit
+
+# Shared HTTP layer: every store/CDN request goes through one pooled session,
+# so icons and screenshots reuse keep-alive connections per host. Each request
+# first takes a token from its host's rate_limit bucket; throttled responses
+# (429/5xx) slow the bucket down and are retried with backoff.
+
+POOL_SIZE = 16          # connections kept alive per host
+RETRIES = 3
+BACKOFF_FACTOR = 0.5    # 0.5s, 1s, 2s ... between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+TIMEOUT = 30
+
+_config = {
+    "pool_size": POOL_SIZE,
+    "retries": RETRIES,
+    "backoff_factor": BACKOFF_FACTOR,
+}
+_session = None
+_lock = threading.Lock()
+
+
+def configure(pool_size=None, retries=None, backoff_factor=None):
+    """Changes the session settings; the next request builds a fresh session."""
+    global _session
+    with _lock:
+        if pool_size is not None:
+            _config["pool_size"] = max(1, int(pool_size))
+        if retries is not None:
+            _config["retries"] = max(0, int(retries))
+        if backoff_factor is not None:
+            _config["backoff_factor"] = float(backoff_factor)
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def create_session(pool_size=POOL_SIZE, retries=RETRIES, backoff_factor=BACKOFF_FACTOR):
+    # urllib3 only retries broken connections; status retries go through get()
+    # so that every attempt is rate limited
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=0,
+        backoff_factor=backoff_factor,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_config() -> dict:
+    with _lock:
+        return dict(_config)
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After header (seconds or HTTP date) -> seconds to wait, 0 if absent/invalid."""
+    if not value:
+        return 0.0
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def backoff_delay(attempt: int, retry_after=None, backoff_factor=None) -> float:
+    """Seconds to wait before retry number attempt (0-based); Retry-After wins if present."""
+    delay = parse_retry_after(retry_after)
+    if delay:
+        return delay
+    if backoff_factor is None:
+        backoff_factor = _config["backoff_factor"]
+    return backoff_factor * (2 ** attempt)
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session(**_config)
+    return _session
+
+
+def get(url: str, **kwargs):
+    """
+    Rate-limited GET. Retries RETRY_STATUSES with exponential backoff, honouring
+    Retry-After; the last response is returned as-is once retries run out.
+    """
+    kwargs.setdefault("timeout", TIMEOUT)
+    session = get_session()
+    bucket = rate_limit.for_url(url)
+    retries = _config["retries"]
+
+    attempt = 0
+    while True:
+        bucket.acquire()
+        start = time.perf_counter()
+        try:
+            r = session.get(url, **kwargs)
+        except Exception:
+            metrics.incr("http.errors")
+            raise
+        finally:
+            metrics.observe_request(url, time.perf_counter() - start)
+        metrics.incr("http.requests")
+        if r.status_code not in RETRY_STATUSES:
+            bucket.succeeded()
+            if r.status_code >= 400:
+                metrics.incr("http.errors")
+            return r
+
+        retry_after = parse_retry_after(r.headers.get("Retry-After"))
+        bucket.throttled(retry_after)
+        if attempt >= retries:
+            metrics.incr("http.errors")
+            return r
+        metrics.incr("http.retries")
+        r.close()
+        # with Retry-After the bucket itself holds the host back
+        if not retry_after:
+            time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def close():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Resized 1x/2x variants of icons and screenshots for the site, in a modern format.
+# Derivatives are cached by source content hash + target size + format, so an
+# unchanged image is never re-encoded, whatever its path or mtime.
+
+DERIVATIVES_DIR = Path(".cache") / "derivatives"
+FORMATS = ("webp", "avif")
+DEFAULT_FORMAT = "webp"
+QUALITY = {"webp": 80, "avif": 55}
+SCALES = (1, 2)
+
+# icon sprite atlases (html_creator --icon-sprites): cells per row, and a version
+# that is part of every atlas' cache key (bump when the packing changes)
+SPRITES_DIR = Path(".cache") / "sprites"
+SPRITE_COLUMNS = 16
+SPRITE_VERSION = 1
+
+# fit: "contain" keeps the whole image inside the box (icons),
+#      "cover" fills the box and crops like CSS object-fit: cover (screenshots)
+FIT_CONTAIN = "contain"
+FIT_COVER = "cover"
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def derivative_path(digest: str, width: int, height: int, fit: str, fmt: str, cache_dir=DERIVATIVES_DIR) -> Path:
+    return Path(cache_dir) / digest[:2] / f"{digest}_{fit}_{width}x{height}.{fmt}"
+
+
+def _resize(img, width: int, height: int, fit: str):
+    if fit == FIT_COVER:
+        return ImageOps.fit(img, (width, height), Image.LANCZOS)
+    img = img.copy()
+    img.thumbnail((width, height), Image.LANCZOS)
+    return img
+
+
+def _encode(img, path: Path, fmt: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    img.save(tmp, format=fmt.upper(), quality=QUALITY.get(fmt, 80))
+    os.replace(tmp, path)
+
+
+def derive(job) -> dict:
+    """
+    job: (src, width, height, fit, fmt, cache_dir). Runs in a worker process.
+    Returns {"src", "1x", "2x", "width", "height"} with paths of the cached
+    variants and the 1x pixel size, or {"src", "error"}.
+    """
+    src, width, height, fit, fmt, cache_dir = job
+    try:
+        digest = file_sha256(src)
+        paths = {s: derivative_path(digest, width * s, height * s, fit, fmt, cache_dir) for s in SCALES}
+
+        if all(p.exists() for p in paths.values()):
+            with Image.open(paths[1]) as img:
+                size = img.size
+        else:
+            with Image.open(src) as img:
+                img.load()
+                for scale, path in sorted(paths.items()):
+                    variant = _resize(img, width * scale, height * scale, fit)
+                    if scale == 1:
+                        size = variant.size
+                    if not path.exists():
+                        _encode(variant, path, fmt)
+    except Exception as e:
+        return {"src": str(src), "error": str(e)}
+
+    result = {f"{s}x": str(p) for s, p in paths.items()}
+    result.update({"src": str(src), "width": size[0], "height": size[1]})
+    return result
+
+
+def thumbnail(src, width: int, height: int, fit=FIT_CONTAIN, fmt="png", cache_dir=DERIVATIVES_DIR) -> str:
+    """Single cached variant of src (any Pillow format, e.g. png for xlsx embedding)."""
+    digest = file_sha256(src)
+    path = derivative_path(digest, width, height, fit, fmt, cache_dir)
+    if not path.exists():
+        with Image.open(src) as img:
+            img.load()
+            _encode(_resize(img, width, height, fit), path, fmt)
+    return str(path)
+
+
+def sprite_digest(member_digests, size: int, columns: int, fmt: str) -> str:
+    key = json.dumps([SPRITE_VERSION, size, columns, fmt, list(member_digests)])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def build_sprite(srcs, size: int, fmt="png", columns=SPRITE_COLUMNS, cache_dir=SPRITES_DIR) -> dict:
+    """
+    Packs srcs (icons) into one atlas of size x size cells, columns per row, at
+    1x and 2x; each icon is fitted into its cell like FIT_CONTAIN. Atlases are
+    cached by the content hashes of their members, so one is only re-encoded
+    when one of its icons changes, whatever their paths (locales, renamed keys).
+    Returns {"1x", "2x", "digest", "width", "height", "cells": {src: [x, y]}} with
+    1x pixel offsets; icons that can't be read are left out of "cells".
+    """
+    srcs = [str(src) for src in srcs]
+    columns = max(1, min(columns, len(srcs)))
+    rows = (len(srcs) + columns - 1) // columns
+    digest = sprite_digest([file_sha256(src) for src in srcs], size, columns, fmt)
+    base = Path(cache_dir) / digest[:2] / digest
+    paths = {s: base.with_name(f"{digest}@{s}x.{fmt}") for s in SCALES}
+    meta_path = base.with_name(f"{digest}.json")
+
+    # the cached metadata lists the cells by member index: the same icons may be
+    # packed again from other paths
+    placed = None
+    if meta_path.exists() and all(p.exists() for p in paths.values()):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                placed = json.load(f)["placed"]
+        except (OSError, ValueError, KeyError, TypeError):
+            placed = None
+    if placed is None:
+        sheets = {s: Image.new("RGBA", (columns * size * s, rows * size * s)) for s in SCALES}
+        placed = []
+        for i, src in enumerate(srcs):
+            x, y = (i % columns) * size, (i // columns) * size
+            try:
+                with Image.open(src) as img:
+                    img.load()
+                    img = img.convert("RGBA")
+                    for s, sheet in sheets.items():
+                        icon = _resize(img, size * s, size * s, FIT_CONTAIN)
+                        sheet.paste(icon, (x * s + (size * s - icon.width) // 2, y * s + (size * s - icon.height) // 2))
+            except Exception as e:
+                print(f"Sprite icon failed: {src}: {e}")
+                continue
+            placed.append(i)
+        for s, sheet in sheets.items():
+            _encode(sheet, paths[s], fmt)
+        tmp = meta_path.with_name(f".{meta_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"placed": placed}, f)
+        os.replace(tmp, meta_path)
+
+    cells = {}
+    for i in placed:
+        if 0 <= i < len(srcs):
+            cells[srcs[i]] = [(i % columns) * size, (i // columns) * size]
+
+    result = {f"{s}x": str(p) for s, p in paths.items()}
+    result.update({"digest": digest, "width": columns * size, "height": rows * size, "cells": cells})
+    return result
+
+
+def build_all(jobs, workers=None, fmt=DEFAULT_FORMAT, cache_dir=DERIVATIVES_DIR) -> dict:
+    """
+    jobs: iterable of (src, width, height, fit). Encodes missing derivatives on a
+    process pool and returns {str(src): derive() result} for the ones that succeeded.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported derivative format: {fmt}")
+    tasks = [(str(src), w, h, fit, fmt, str(cache_dir)) for src, w, h, fit in jobs]
+    if not tasks:
+        return {}
+
+    if workers == 1:
+        results = map(derive, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(derive, tasks, chunksize=8)
+
+    out = {}
+    try:
+        for r in results:
+            if "error" in r:
+                print(f"Derivative failed: {r['src']}: {r['error']}")
+                continue
+            out[r["src"]] = r
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    return out
@@ -0,0 +1,49 @@
+import re
+
+# Storefronts as (country, lang) pairs, e.g. ("de", "de") for the German stores.
+# The default locale keeps the original file layout (apps.jsonl, apps_content/,
+# site/); every other locale gets its own outputs tagged "<country>-<lang>":
+#   apps.de-de.jsonl, apps.de-de.xlsx, apps_content/de-de/<key>/, site/de-de/
+# Images are shared between locales through asset_store (keyed by URL, stored by
+# content hash), so a locale whose store serves the same icon/screenshot URLs
+# costs only its own metadata requests.
+
+DEFAULT_LOCALE = ("us", "en")
+
+
+def parse_locale(value: str):
+    """'country:lang' (or 'country-lang') -> (country, lang)"""
+    m = re.fullmatch(r"\s*([A-Za-z]{2})[:-]([A-Za-z]{2,3}(?:_[A-Za-z]{2,4})?)\s*", str(value))
+    if not m:
+        raise ValueError(f"expected COUNTRY:LANG like us:en or de:de, got {value!r}")
+    return m.group(1).lower(), m.group(2)
+
+
+def parse_locales(value: str) -> list:
+    """'us:en,de:de' -> [("us", "en"), ("de", "de")] without duplicates."""
+    result = []
+    for part in str(value).split(","):
+        if part.strip():
+            locale = parse_locale(part)
+            if locale not in result:
+                result.append(locale)
+    if not result:
+        raise ValueError("expected at least one COUNTRY:LANG")
+    return result
+
+
+def tag(locale) -> str:
+    country, lang = locale
+    return f"{country}-{lang.lower().replace('_', '-')}"
+
+
+def suffix(locale) -> str:
+    """File name suffix of a locale's outputs ("" for the default locale)."""
+    return "" if not locale or tuple(locale) == DEFAULT_LOCALE else f".{tag(locale)}"
+
+
+def subdir(base, locale):
+    """base for the default locale, base/<tag> for the others (same type as base)."""
+    if not locale or tuple(locale) == DEFAULT_LOCALE:
+        return base
+    return base / tag(locale) if hasattr(base, "joinpath") else f"{base}/{tag(locale)}"
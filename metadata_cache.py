@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import metrics
+
+# On-disk cache of raw store metadata (google_play_scraper dict / iTunes lookup result),
+# keyed by (store, id, country, lang). Fresh entries skip the network entirely.
+# Neither the Play details page nor the iTunes lookup API return validators
+# (ETag / Last-Modified), so a stale entry is simply refetched and overwritten.
+
+CACHE_DIR = Path(".cache") / "metadata"
+
+DEFAULT_TTL = {
+    "google": 24 * 3600,
+    "apple": 24 * 3600,
+}
+
+_config = {
+    "cache_dir": CACHE_DIR,
+    "ttl": dict(DEFAULT_TTL),
+    "refresh": False,
+    "enabled": True,
+    "app_ttl": {},
+}
+_lock = threading.Lock()
+
+
+def configure(cache_dir=None, max_age=None, ttl=None, refresh=None, enabled=None, app_ttl=None):
+    """
+    max_age overrides the TTL (seconds) of every store, ttl overrides single stores.
+    refresh=True ignores cached entries but still writes fresh ones.
+    app_ttl: {(store, id): seconds} longer TTLs for single apps (delta.quiet_ttls); replaces the previous map.
+    """
+    with _lock:
+        if cache_dir is not None:
+            _config["cache_dir"] = Path(cache_dir)
+        if max_age is not None:
+            _config["ttl"] = {store: float(max_age) for store in _config["ttl"]}
+        if ttl:
+            _config["ttl"].update({store: float(v) for store, v in ttl.items()})
+        if refresh is not None:
+            _config["refresh"] = bool(refresh)
+        if enabled is not None:
+            _config["enabled"] = bool(enabled)
+        if app_ttl is not None:
+            _config["app_ttl"] = dict(app_ttl)
+
+
+def _safe(part) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", str(part or "")) or "_"
+
+
+def entry_path(store: str, app_id: str, country="us", lang="en") -> Path:
+    return _config["cache_dir"] / _safe(store) / f"{_safe(country)}_{_safe(lang)}" / f"{_safe(app_id)}.json"
+
+
+def read_entry(store: str, app_id: str, country="us", lang="en"):
+    """Returns the cached entry dict (with fetched_at) regardless of age, or None."""
+    path = entry_path(store, app_id, country, lang)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(store: str, app_id: str, country="us", lang="en"):
+    """Returns the cached raw metadata if it is younger than the store TTL, else None."""
+    if not _config["enabled"]:
+        return None
+    if _config["refresh"]:
+        metrics.incr(f"metadata_cache.{store}.miss")
+        return None
+
+    entry = read_entry(store, app_id, country, lang)
+    if not entry:
+        metrics.incr(f"metadata_cache.{store}.miss")
+        return None
+
+    ttl = max(_config["ttl"].get(store, 0), _config["app_ttl"].get((store, str(app_id)), 0))
+    age = time.time() - float(entry.get("fetched_at") or 0)
+    if age < 0 or age >= ttl:
+        metrics.incr(f"metadata_cache.{store}.miss")
+        return None
+    metrics.incr(f"metadata_cache.{store}.hit")
+    return entry.get("data")
+
+
+def load_stale(store: str, app_id: str, country="us", lang="en"):
+    """Cached raw metadata of any age; the fallback when the store keeps failing."""
+    if not _config["enabled"]:
+        return None
+    entry = read_entry(store, app_id, country, lang)
+    if entry:
+        metrics.incr(f"metadata_cache.{store}.stale")
+    return entry.get("data") if entry else None
+
+
+def save(store: str, app_id: str, data, country="us", lang="en"):
+    if not _config["enabled"] or not app_id:
+        return
+
+    path = entry_path(store, app_id, country, lang)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "store": store,
+        "id": str(app_id),
+        "country": country,
+        "lang": lang,
+        "fetched_at": time.time(),
+        "data": data,
+    }
+    # write-then-rename so concurrent workers never see a half-written file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
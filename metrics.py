@@ -0,0 +1,187 @@
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Process-wide run metrics: latency histograms per stage and per host, plus
+# counters (bytes, cache hits/misses, retries, failures). Cheap enough to stay
+# on: one lock round-trip per observation. runner.py and html_creator.py write
+# a JSON snapshot and print a summary at the end of a run.
+#
+# APPS_PROFILE=<path>.prof runs the whole command under cProfile and dumps the
+# stats there (APPS_PROFILE=1 picks .cache/metrics/<command>.prof). cProfile only
+# sees the main thread; fetch stages on worker threads show up in the histograms.
+
+METRICS_DIR = Path(".cache") / "metrics"
+PROFILE_ENV = "APPS_PROFILE"
+
+# histogram bucket upper bounds, seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+_histograms = {}
+_counters = {}
+_started = time.time()
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """q-quantile, interpolated linearly inside its bucket (clamped to the observed min/max)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = self.min
+        for bound, n in zip(BUCKETS, self.buckets):
+            if n and seen + n >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = max(bound, self.min)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_s": round(self.total / self.count, 6) if self.count else 0.0,
+            "min_s": round(self.min, 6) if self.count else 0.0,
+            "max_s": round(self.max, 6),
+            "p50_s": round(self.quantile(0.5), 6),
+            "p90_s": round(self.quantile(0.9), 6),
+            "p99_s": round(self.quantile(0.99), 6),
+            "buckets": {("inf" if b == float("inf") else str(b)): n for b, n in zip(BUCKETS, self.buckets) if n},
+        }
+
+
+def reset():
+    global _started
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _started = time.time()
+
+
+def observe(name: str, seconds: float):
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = Histogram()
+        h.add(seconds)
+
+
+def incr(name: str, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+
+def observe_request(url: str, seconds: float):
+    observe(f"host.{host_of(url)}", seconds)
+
+
+@contextmanager
+def timer(name: str):
+    """Records the duration of the block under name (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "started_at": _started,
+            "wall_s": round(time.time() - _started, 3),
+            "stages": {k: h.to_dict() for k, h in sorted(_histograms.items()) if not k.startswith("host.")},
+            "hosts": {k[5:]: h.to_dict() for k, h in sorted(_histograms.items()) if k.startswith("host.")},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def hit_ratio(counters: dict, prefix: str):
+    hits = counters.get(f"{prefix}.hit", 0)
+    total = hits + counters.get(f"{prefix}.miss", 0)
+    return hits / total if total else None
+
+
+def summary(snap=None) -> str:
+    snap = snap or snapshot()
+    lines = [f"Metrics ({snap['wall_s']:.1f}s wall):"]
+    for title, group in (("stage", snap["stages"]), ("host", snap["hosts"])):
+        for name, h in group.items():
+            lines.append(
+                f"  {title} {name:<28} n={h['count']:<6} total={h['total_s']:.2f}s "
+                f"p50={h['p50_s'] * 1000:.0f}ms p90={h['p90_s'] * 1000:.0f}ms max={h['max_s'] * 1000:.0f}ms"
+            )
+    counters = snap["counters"]
+    for prefix in sorted({k.rsplit(".", 1)[0] for k in counters if k.endswith((".hit", ".miss"))}):
+        lines.append(f"  cache {prefix:<28} hit ratio {hit_ratio(counters, prefix):.0%}")
+    for name, value in counters.items():
+        if name.endswith("bytes"):
+            lines.append(f"  {name:<34} {value / 1048576:.1f} MiB")
+        else:
+            lines.append(f"  {name:<34} {value}")
+    return "\n".join(lines)
+
+
+def write(path):
+    """Writes the snapshot as JSON and prints the summary."""
+    snap = snapshot()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snap, f, indent=2)
+    os.replace(tmp, path)
+    print(summary(snap))
+    print(f"Metrics written: {path}")
+
+
+def default_path(command: str) -> Path:
+    return METRICS_DIR / f"{command}.json"
+
+
+@contextmanager
+def profiled(command: str):
+    """Runs the block under cProfile when PROFILE_ENV is set."""
+    target = os.environ.get(PROFILE_ENV, "")
+    if not target or target == "0":
+        yield
+        return
+    path = Path(target if target.endswith(".prof") else METRICS_DIR / f"{command}.prof")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(path))
+        pstats.Stats(str(path)).sort_stats("cumulative").print_stats(20)
+        print(f"Profile written: {path}")
@@ -1,13 +1,26 @@
 import re
-from google_play_scraper import app as gapp
-from apple_store_parser import parse_apple, apple_to_row, normalize_track_id
+import json
+from google_play_scraper.constants.request import Formats
+from google_play_scraper.features.app import parse_dom
+from apple_store_parser import parse_apple, parse_apple_batch, apple_to_row, normalize_track_id, DEFAULT_CHUNK_SIZE
 import xlsxwriter
-import requests
+import http_client
+import metadata_cache
+import asset_store
+import cdn_images
+import checkpoint
+import metrics
+import delta
+import locales
 import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlsplit
 
 
 FILE_NAME = "apps.xlsx"
+DATASET_FILE = "apps.jsonl"   # typed per-app records, the input of html_creator
 CONTENT_DIRECTORY = "apps_content"
 
 SETUP = [
@@ -24,9 +37,31 @@ SETUP = [
 
 ALERT = "Warning: This table is auto-generated. Any changes made will be overridden."
 
+DEFAULT_WORKERS = 8
+MAX_SCREENSHOTS = 3
+
+XLSX_IMAGE_MODES = ("embed", "thumbnail", "link", "none")
+# px boxes that fit the 160pt row; embed mode scales every image into them by
+# its real size (sized CDN image or original), thumbnail mode resizes to them
+XLSX_ICON_THUMBNAIL = (48, 48)
+XLSX_SCREENSHOT_THUMBNAIL = (120, 210)
+FIRST_DATA_ROW = 2  # row 0: alert, row 1: headers
+APPLE_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+
 
 def parse_single(package):
-    return gapp(package, lang='en', country='us')
+    return parse_google(package)
+
+
+def set_play_base_url(base_url: str):
+    """
+    Points detail page requests at a mirror or a local fake store (benchmarks).
+    Images the mirror serves itself are expected to resize like the Play CDN.
+    """
+    base_url = base_url.rstrip("/")
+    cdn_images.configure(google_hosts=[urlsplit(base_url).hostname])
+    Formats.Detail.URL_FORMAT = f"{base_url}/store/apps/details?id={{app_id}}&hl={{lang}}&gl={{country}}"
+    Formats.Detail.FALLBACK_URL_FORMAT = f"{base_url}/store/apps/details?id={{app_id}}&hl={{lang}}"
 
 
 def filter_google(parsed):
@@ -35,10 +70,12 @@ def filter_google(parsed):
         "title": parsed.get("title", ""),
         "genre": parsed.get("genre", ""),
         "installs": parsed.get("installs", ""),
+        "min_installs": parsed.get("minInstalls"),
         "release_date": parsed.get("released", ""),
         "google_url": parsed.get("url", ""),
         "icon": parsed.get("icon", ""),
-        "screenshots": parsed.get("screenshots", []) or []
+        "screenshots": parsed.get("screenshots", []) or [],
+        "updated": parsed.get("updated"),
     }
 
 
@@ -61,10 +98,9 @@ def get_app_folder(parsed):
 
 
 def request_ico(parsed):
-    response = requests.get(parsed['icon'])
     app_folder = get_app_folder(parsed)
     path = app_folder + '/icon.png'
-    open(path, 'wb').write(response.content)
+    download_file(parsed['icon'], path)
     return path
 
 
@@ -76,9 +112,8 @@ def request_screenshots(parsed):
     if len(links) < screenshot_amount:
         screenshot_amount = len(links)
     for index in range(screenshot_amount):
-        response = requests.get(links[index])
         path = (app_folder + '/screenshot{}.png').format(index)
-        open(path, 'wb').write(response.content)
+        download_file(links[index], path)
         screenshot_list.append(path)
     return screenshot_list
 
@@ -107,28 +142,10 @@ def write_headers(workbook, worksheet):
         worksheet.write(1, i, headers[i], get_bold_format(workbook))
 
 
-def write_to_xlsx(icon_path, rows, workbook, worksheet, row):
-    text_format = workbook.add_format({'text_wrap': True})
-    write_alert(workbook, worksheet)
-    write_headers(workbook, worksheet)
-    col = 1
-    for i in range(len(rows)):
-        worksheet.insert_image(row + i, col-1, icon_path, {"x_scale": 0.1, "y_scale": 0.1})
-        for j in range(len(rows[i])):
-            worksheet.write(row + i, col + j, rows[i][j], text_format)
-
-
-def write_screenshots(screenshots_path_array, rows, worksheet, row):
-    base_col = 1 + len(rows[0])
-    for i in range(len(rows)):
-        for j, p in enumerate(screenshots_path_array):
-            worksheet.insert_image(row + i, base_col + j, p, {"x_scale": 0.4, "y_scale": 0.4})
-
-
-def create_workbook(file_name):
+def create_workbook(file_name, constant_memory=False):
     if os.path.exists(file_name):
         os.remove(file_name)
-    workbook = xlsxwriter.Workbook(file_name)
+    workbook = xlsxwriter.Workbook(file_name, {"constant_memory": constant_memory})
     return workbook
 
 
@@ -137,8 +154,35 @@ def create_worksheet(workbook):
     return worksheet
 
 
-def parse_google(package):
-    return gapp(package, lang="en", country="us")
+def parse_google(package, lang="en", country="us"):
+    # same as google_play_scraper.app, but fetched through the pooled session
+    cached = metadata_cache.load("google", package, country, lang)
+    if cached:
+        return cached
+
+    try:
+        url = Formats.Detail.build(app_id=package, lang=lang, country=country)
+        r = http_client.get(url)
+        if r.status_code == 404:
+            url = Formats.Detail.fallback_build(app_id=package, lang=lang)
+            r = http_client.get(url)
+        r.raise_for_status()
+    except Exception as e:
+        # throttled past all retries: keep the app in the table with its last known data
+        stale = metadata_cache.load_stale("google", package, country, lang)
+        if stale and not is_not_found(e):
+            print(f"Google fetch failed, using cached data: {package}: {e}")
+            return stale
+        raise
+
+    parsed = parse_dom(dom=r.text, app_id=package, url=url)
+    metadata_cache.save("google", package, parsed, country, lang)
+    return parsed
+
+
+def is_not_found(e) -> bool:
+    response = getattr(e, "response", None)
+    return response is not None and response.status_code == 404
 
 def build_row(google_data: dict, apple_data: dict):
     title = (google_data or {}).get("title") or (apple_data or {}).get("title") or ""
@@ -158,9 +202,68 @@ def build_row(google_data: dict, apple_data: dict):
         (apple_data or {}).get("url", ""),
     ]
 
-def try_create_record(entry, workbook, worksheet, row):
+def pick_asset_urls(google_data: dict, apple_data: dict, max_shots=MAX_SCREENSHOTS):
+    icon_url = (google_data or {}).get("icon") or (apple_data or {}).get("icon") or ""
+    screenshots = (google_data or {}).get("screenshots") or (apple_data or {}).get("screenshots") or []
+    return icon_url, list(screenshots)[:max_shots]
+
+
+def installs_to_int(installs) -> int:
+    s = str(installs or "").replace(",", "").replace("+", "").strip()
+    return int(s) if s.isdigit() else 0
+
+
+def build_dataset_row(key: str, google_data: dict, apple_data: dict, icon_path: str, screenshot_paths: list) -> dict:
+    """Typed counterpart of build_row, one line of DATASET_FILE."""
+    google_data = google_data or {}
+    apple_data = apple_data or {}
+    installs = google_data.get("installs") or ""
+    min_installs = google_data.get("min_installs")
+    icon_url, screenshot_urls = pick_asset_urls(google_data, apple_data)
+
+    return {
+        "key": key,
+        "google_id": google_data.get("google_id", "") or "",
+        "apple_id": apple_data.get("apple_id", "") or "",
+        "title": google_data.get("title") or apple_data.get("title") or "",
+        "genre": google_data.get("genre") or apple_data.get("genre") or "",
+        "installs": installs,
+        "installs_num": min_installs if isinstance(min_installs, int) else installs_to_int(installs),
+        "release_date": to_iso_date(google_data.get("release_date") or apple_data.get("release_date") or ""),
+        "google_url": google_data.get("google_url", "") or "",
+        "apple_url": apple_data.get("url", "") or "",
+        "icon": icon_path if icon_path and os.path.exists(icon_path) else "",
+        "screenshots": list(screenshot_paths),
+        "icon_url": icon_url,
+        "screenshot_urls": screenshot_urls,
+        "google_updated": google_data.get("updated") or "",
+        "apple_updated": apple_data.get("updated") or "",
+    }
+
+
+def make_record(key: str, google_data: dict, apple_data: dict, icon_path: str, screenshot_paths: list) -> dict:
+    return {
+        "key": key,
+        "data_row": build_row(google_data, apple_data),
+        "data": build_dataset_row(key, google_data, apple_data, icon_path, screenshot_paths),
+        "icon_path": icon_path,
+        "screenshot_paths": screenshot_paths,
+    }
+
+
+def fetch_record(entry, apple_results=None, previous=None, locale=locales.DEFAULT_LOCALE):
+    """
+    Network stage: fetches store metadata and assets for one entry.
+    Returns a record dict for RecordSink.write, or None if neither store resolved.
+    apple_results is an optional {trackId: result} map from parse_apple_batch;
+    when given, Apple data is taken from it instead of a per-id lookup.
+    previous is the entry's row from the last run (delta mode); its assets are
+    reused if the app did not change. locale is the (country, lang) storefront.
+    Safe to call from worker threads (touches no workbook state).
+    """
     google_id = entry.get("google", "")
     apple_id = normalize_track_id(entry.get("apple", ""))
+    country, lang = locale
 
     google_data = None
     apple_data = None
@@ -168,40 +271,255 @@ def try_create_record(entry, workbook, worksheet, row):
     # 1) Google
     if google_id:
         try:
-            g = parse_google(google_id)
+            with metrics.timer("google.fetch"):
+                g = parse_google(google_id, lang=lang, country=country)
             google_data = filter_google(g)
         except Exception as e:
+            metrics.incr("google.failed")
             print(f"Google parse failed: {google_id}: {e}")
 
     # 2) Apple
-    if apple_id:
+    if apple_id and apple_results is not None:
+        a = apple_results.get(apple_id)
+        if a:
+            apple_data = apple_to_row(a)
+    elif apple_id:
         try:
-            a = parse_apple(apple_id, country="us", lang="en")
+            with metrics.timer("apple.lookup"):
+                a = parse_apple(apple_id, country=country, lang=lang)
             apple_data = apple_to_row(a)
         except Exception as e:
+            metrics.incr("apple.failed")
             print(f"Apple parse failed: {apple_id}: {e}")
 
     if not google_data and not apple_data:
-        return False
+        return None
 
     key = get_record_key(
         (google_data or {}).get("google_id", ""),
         (apple_data or {}).get("apple_id", ""),
     )
 
-    icon_url = (google_data or {}).get("icon") or (apple_data or {}).get("icon") or ""
-    screenshots = (google_data or {}).get("screenshots") or (apple_data or {}).get("screenshots") or []
+    icon_url, screenshots = pick_asset_urls(google_data, apple_data)
+
+    reused = previous_assets(previous, key, google_data, apple_data)
+    if reused:
+        icon_path, screenshot_paths = reused
+    else:
+        icon_path, screenshot_paths = request_icon_and_screens(key, icon_url, screenshots, locale=locale)
+
+    return make_record(key, google_data, apple_data, icon_path, screenshot_paths)
+
+
+def previous_assets(previous, key, google_data, apple_data):
+    if not previous:
+        return None
+    return delta.reusable_assets(previous, key, build_dataset_row(key, google_data, apple_data, "", []))
+
+
+def finish_record(entry, record, baseline=None, previous=None):
+    """
+    Tags a fetched record with its entry id (checkpoint journal) and, in delta
+    mode, with its change status; a failed fetch falls back to the previous row.
+    """
+    if baseline is not None:
+        if record is None and previous:
+            print(f"Fetch failed, keeping the previous row: {previous.get('key')}")
+            record = record_from_dataset_row(previous)
+            record["change"] = {"status": delta.STALE}
+        elif record is not None:
+            fields = delta.changed_fields(previous, record["data"]) if previous else []
+            status = delta.ADDED if not previous else delta.CHANGED if fields else delta.UNCHANGED
+            record["change"] = {"status": status, "fields": fields}
+            if previous and previous.get("key") != record["key"]:
+                record["change"]["previous_key"] = previous.get("key")
+    if record is not None:
+        record["entry_id"] = checkpoint.entry_id(entry)
+    return record
+
+
+class RecordSink:
+    """
+    Single-threaded output stage shared by both pipelines: writes records in the
+    order they are given to DATASET_FILE (always) and to the xlsx workbook (optional).
+
+    xlsx_images: "embed" inserts the downloaded icon/screenshots (default),
+    "thumbnail" inserts small cached PNG thumbnails, "link" writes hyperlinks to
+    the store image urls, "none" writes text only.
+    streaming=True opens xlsxwriter in constant_memory mode: every row is flushed
+    to disk once the next one starts, so memory stays flat for any catalogue size.
+    """
+
+    def __init__(self, xlsx=True, file_name=FILE_NAME, dataset_file=DATASET_FILE,
+                 xlsx_images="embed", streaming=False, journal=None):
+        if xlsx_images not in XLSX_IMAGE_MODES:
+            raise ValueError(f"Unsupported xlsx_images mode: {xlsx_images}")
+        self.row = FIRST_DATA_ROW
+        self.images = xlsx_images
+        self.workbook = self.worksheet = None
+        if xlsx:
+            self.workbook = create_workbook(file_name, constant_memory=streaming)
+            self.worksheet = create_worksheet(self.workbook)
+            format_column(self.worksheet)
+            write_alert(self.workbook, self.worksheet)
+            write_headers(self.workbook, self.worksheet)
+            self.text_format = get_wrap_format(self.workbook)
+        create_content_dir()
+
+        self.journal = journal
+        self.dataset = None
+        self.dataset_file = dataset_file
+        if dataset_file:
+            self.dataset_tmp = f"{dataset_file}.tmp"
+            self.dataset = open(self.dataset_tmp, "w", encoding="utf-8")
+
+    def write(self, record):
+        if self.journal is not None:
+            self.journal.append(record)
+        if self.dataset is not None:
+            with metrics.timer("dataset.write"):
+                self.dataset.write(json.dumps(record["data"], ensure_ascii=False) + "\n")
+        if self.workbook is not None:
+            with metrics.timer("xlsx.write"):
+                self.write_xlsx_row(record)
+        metrics.incr("records.written")
+        print(record["data_row"])
+        self.row += 1
+
+    def write_xlsx_row(self, record):
+        worksheet, row = self.worksheet, self.row
+        data_row = record["data_row"]
+        shots_col = 1 + len(data_row)
+
+        # constant_memory mode needs the row height before any cell of the row
+        if self.images in ("embed", "thumbnail"):
+            worksheet.set_row(row, 160)
+
+        for j, value in enumerate(data_row):
+            worksheet.write(row, 1 + j, value, self.text_format)
+
+        if self.images == "embed":
+            icon_scale = xlsx_embed_scale(record["icon_path"], *XLSX_ICON_THUMBNAIL)
+            worksheet.insert_image(row, 0, record["icon_path"], {"x_scale": icon_scale, "y_scale": icon_scale})
+            for j, p in enumerate(record["screenshot_paths"]):
+                shot_scale = xlsx_embed_scale(p, *XLSX_SCREENSHOT_THUMBNAIL)
+                worksheet.insert_image(row, shots_col + j, p, {"x_scale": shot_scale, "y_scale": shot_scale})
+        elif self.images == "thumbnail":
+            icon = xlsx_thumbnail(record["icon_path"], *XLSX_ICON_THUMBNAIL)
+            if icon:
+                worksheet.insert_image(row, 0, icon)
+            for j, p in enumerate(record["screenshot_paths"]):
+                shot = xlsx_thumbnail(p, *XLSX_SCREENSHOT_THUMBNAIL)
+                if shot:
+                    worksheet.insert_image(row, shots_col + j, shot)
+        elif self.images == "link":
+            data = record["data"]
+            if data.get("icon_url"):
+                worksheet.write_url(row, 0, data["icon_url"], string="icon")
+            for j, u in enumerate(data.get("screenshot_urls") or []):
+                worksheet.write_url(row, shots_col + j, u, string=f"screenshot {j + 1}")
+
+    def close(self):
+        # the dataset only replaces the previous one once the run has completed
+        if self.dataset is not None:
+            self.dataset.close()
+            os.replace(self.dataset_tmp, self.dataset_file)
+        if self.journal is not None:
+            self.journal.discard()
+        if self.workbook is not None:
+            # without constant_memory, this is where the whole workbook is written
+            with metrics.timer("xlsx.close"):
+                self.workbook.close()
+
+
+def xlsx_embed_scale(path, width, height) -> float:
+    """insert_image scale that fits the image at path into width x height px (never enlarges)."""
+    try:
+        # deferred like image_derivatives: only opens the header for the size
+        from PIL import Image
+        with Image.open(path) as img:
+            w, h = img.size
+    except Exception:
+        return 1.0
+    return min(1.0, width / w, height / h)
 
-    icon_path, screenshot_paths = request_icon_and_screens(key, icon_url, screenshots)
 
-    worksheet.set_row(row, 160)
-    data_row = build_row(google_data, apple_data)
+def xlsx_thumbnail(path, width, height):
+    if not path or not os.path.exists(path):
+        return ""
+    try:
+        # deferred: Pillow is only needed for this export mode
+        import image_derivatives
+        return image_derivatives.thumbnail(path, width, height)
+    except Exception as e:
+        print(f"Thumbnail failed: {path}: {e}")
+        return ""
 
-    write_to_xlsx(icon_path, [data_row], workbook, worksheet, row)
-    write_screenshots(screenshot_paths, [data_row], worksheet, row)
 
-    print(data_row)
-    return True
+def prefetch_apple(entries, chunk_size=APPLE_CHUNK_SIZE, journal=None, locale=locales.DEFAULT_LOCALE):
+    """
+    Buffers entries chunk_size at a time and resolves their Apple ids with one
+    parse_apple_batch call per chunk. Yields (entry, apple_results, done) in input
+    order, where done is the record a resumed journal already holds for the entry
+    (those entries are not looked up again).
+    """
+    chunk = []
+    for entry in entries:
+        chunk.append((entry, journal.lookup(entry) if journal else None))
+        if len(chunk) >= chunk_size:
+            yield from _resolve_apple_chunk(chunk, locale)
+            chunk = []
+    if chunk:
+        yield from _resolve_apple_chunk(chunk, locale)
+
+
+def _resolve_apple_chunk(chunk, locale=locales.DEFAULT_LOCALE):
+    country, lang = locale
+    with metrics.timer("apple.lookup"):
+        apple_results = parse_apple_batch(
+            [e.get("apple", "") for e, done in chunk if not done],
+            country=country, lang=lang, chunk_size=len(chunk),
+        )
+    for entry, done in chunk:
+        yield entry, apple_results, done
+
+
+def fetch_entry(entry, apple_results=None, baseline=None, locale=locales.DEFAULT_LOCALE):
+    previous = baseline.find(entry) if baseline is not None else None
+    with metrics.timer("record.fetch"):
+        record = fetch_record(entry, apple_results, previous, locale)
+    return finish_record(entry, record, baseline, previous)
+
+
+def fetch_records(entries, workers=DEFAULT_WORKERS, apple_chunk_size=APPLE_CHUNK_SIZE, journal=None,
+                  baseline=None, locale=locales.DEFAULT_LOCALE):
+    """
+    Runs fetch_record over entries on a thread pool and yields the results
+    (record or None) in input order. Apple ids are resolved apple_chunk_size
+    at a time, and at most 2 * workers entries are in flight, so entries may
+    be a lazy iterable. Entries already in journal are passed through unfetched;
+    baseline (delta.Baseline) enables delta mode.
+    """
+    prefetched = prefetch_apple(entries, apple_chunk_size, journal, locale)
+
+    if workers <= 1:
+        for entry, apple_results, done in prefetched:
+            yield done or fetch_entry(entry, apple_results, baseline, locale)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for entry, apple_results, done in prefetched:
+            if done:
+                future = Future()
+                future.set_result(done)
+            else:
+                future = pool.submit(fetch_entry, entry, apple_results, baseline, locale)
+            pending.append(future)
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 def get_record_key(google_id: str, apple_id: str):
@@ -212,65 +530,147 @@ def get_record_key(google_id: str, apple_id: str):
     return "unknown"
 
 
-def get_app_folder_by_key(key: str):
-    app_folder = f"{CONTENT_DIRECTORY}/{key}"
+def get_app_folder_by_key(key: str, locale=locales.DEFAULT_LOCALE):
+    app_folder = f"{locales.subdir(CONTENT_DIRECTORY, locale)}/{key}"
     if not os.path.exists(app_folder):
         os.makedirs(app_folder, exist_ok=True)
     return app_folder
 
 
-def download_file(url: str, path: str):
-    if not url:
+def download_file(url: str, path: str, original_url: str = ""):
+    # skips the request when url was fetched before, dedupes identical images;
+    # original_url: what url was resized from (cdn_images), used when url fails
+    try:
+        with metrics.timer("asset.download"):
+            return asset_store.fetch(url, path)
+    except Exception as e:
+        if original_url and original_url != url:
+            metrics.incr("asset.resize_failed")
+            print(f"Sized asset failed, fetching the original: {url}: {e}")
+            return download_file(original_url, path)
+        metrics.incr("asset.failed")
+        print(f"Asset download failed: {url}: {e}")
         return False
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    with open(path, "wb") as f:
-        f.write(r.content)
-    return True
 
 
-def request_icon_and_screens(key: str, icon_url: str, screenshots: list, max_shots=3):
-    folder = get_app_folder_by_key(key)
+def request_icon_and_screens(key: str, icon_url: str, screenshots: list, max_shots=MAX_SCREENSHOTS,
+                             locale=locales.DEFAULT_LOCALE):
+    # URLs shared between locales are downloaded once (asset_store is keyed by URL)
+    folder = get_app_folder_by_key(key, locale)
 
     icon_path = f"{folder}/icon.png"
     if icon_url:
-        download_file(icon_url, icon_path)
+        download_file(cdn_images.icon_url(icon_url), icon_path, icon_url)
 
     shot_paths = []
     for i, u in enumerate((screenshots or [])[:max_shots]):
         p = f"{folder}/screenshot{i}.png"
-        download_file(u, p)
-        shot_paths.append(p)
+        # a failed download keeps the previous run's file, if there is one
+        if download_file(cdn_images.screenshot_url(u), p, u) or os.path.exists(p):
+            shot_paths.append(p)
 
     return icon_path, shot_paths
 
 
-def parse_entries(entries):
-    file_name = FILE_NAME
-    workbook = create_workbook(file_name)
-    worksheet = create_worksheet(workbook)
+def output_files(shard=None, locale=locales.DEFAULT_LOCALE):
+    """(xlsx, dataset, journal) file names; shards and non-default locales get their own set."""
+    suffix = locales.suffix(locale) + checkpoint.shard_suffix(shard)
+    base, ext = os.path.splitext(FILE_NAME)
+    dataset_base, dataset_ext = os.path.splitext(DATASET_FILE)
+    return (
+        f"{base}{suffix}{ext}",
+        f"{dataset_base}{suffix}{dataset_ext}",
+        f"{dataset_base}{suffix}.journal{dataset_ext}",
+    )
+
+
+def change_report_file(shard=None, locale=locales.DEFAULT_LOCALE):
+    base, ext = os.path.splitext(delta.CHANGE_REPORT)
+    return f"{base}{locales.suffix(locale)}{checkpoint.shard_suffix(shard)}{ext}"
+
+
+def load_baseline(since_last_run, dataset_file):
+    """
+    since_last_run: None (full run), True (this run's previous dataset) or a dataset path.
+    Also gives the baseline's quiet apps their longer metadata TTL (delta.quiet_ttls).
+    """
+    if not since_last_run:
+        metadata_cache.configure(app_ttl={})
+        return None
+    baseline = delta.Baseline(dataset_file if since_last_run is True else since_last_run)
+    quiet = delta.quiet_ttls(baseline)
+    metadata_cache.configure(app_ttl=quiet)
+    metrics.incr("delta.quiet", len(quiet))
+    if quiet:
+        print(f"Delta: {len(quiet)} quiet store entries reuse metadata up to {delta.QUIET_TTL // 86400} days old")
+    return baseline
+
+
+def parse_entries(entries, workers=DEFAULT_WORKERS, xlsx=True, xlsx_images="embed", streaming=False,
+                  shard=None, resume=False, since_last_run=None, locale=locales.DEFAULT_LOCALE):
+    """
+    shard=(i, N) only processes the entries of that shard and writes shard-named
+    outputs; resume=True reuses the records of an interrupted run's journal;
+    since_last_run compares every app with the previous dataset (see load_baseline);
+    locale=(country, lang) selects the storefront (see locales).
+    """
+    file_name, dataset_file, journal_file = output_files(shard, locale)
+    baseline = load_baseline(since_last_run, dataset_file)
+    report = delta.ChangeReport(baseline) if baseline is not None else None
+    journal = checkpoint.Journal(journal_file, resume)
+    sink = RecordSink(
+        xlsx=xlsx, file_name=file_name, dataset_file=dataset_file,
+        xlsx_images=xlsx_images, streaming=streaming, journal=journal,
+    )
+
+    entries = checkpoint.select_shard(entries, shard)
+    for record in fetch_records(entries, workers, journal=journal, baseline=baseline, locale=locale):
+        if record:
+            sink.write(record)
+            if report is not None:
+                report.add(record)
+
+    sink.close()
+    if report is not None:
+        report.write(change_report_file(shard, locale))
 
-    format_column(worksheet)
-    create_content_dir()
 
-    invalid_count = 0
-    alert_spacing = 1
-    headers_spacing = 1
+def record_from_dataset_row(row: dict) -> dict:
+    """Rebuilds a RecordSink record from a DATASET_FILE row (merge, reuse of earlier runs)."""
+    return {
+        "key": row.get("key", ""),
+        "data_row": [
+            row.get("google_id", ""),
+            row.get("apple_id", ""),
+            row.get("title", ""),
+            row.get("genre", ""),
+            row.get("installs", ""),
+            row.get("release_date", ""),
+            row.get("google_url", ""),
+            row.get("apple_url", ""),
+        ],
+        "data": row,
+        "icon_path": row.get("icon") or f"{CONTENT_DIRECTORY}/{row.get('key', '')}/icon.png",
+        "screenshot_paths": list(row.get("screenshots") or []),
+    }
 
-    for index, entry in enumerate(entries):
-        package_index = index - invalid_count
-        row = package_index + alert_spacing + headers_spacing  # xlsxwriter row index (0-based)
-        ok = try_create_record(entry, workbook, worksheet, row)
-        if not ok:
-            invalid_count += 1
 
-    workbook.close()
+def merge_shards(inputs, xlsx=True, xlsx_images="embed", streaming=False, locale=locales.DEFAULT_LOCALE):
+    """Combines shard datasets into the locale's DATASET_FILE (and optionally FILE_NAME)."""
+    file_name, dataset_file, _ = output_files(locale=locale)
+    sink = RecordSink(xlsx=xlsx, file_name=file_name, dataset_file=None, xlsx_images=xlsx_images, streaming=streaming)
+    count = 0
+    for row in checkpoint.merge_datasets(inputs, dataset_file):
+        sink.write(record_from_dataset_row(row))
+        count += 1
+    sink.close()
+    print(f"Merged {count} records from {len(inputs)} shard(s) into {dataset_file}")
 
 
-def parse_packages(packages):
+def parse_packages(packages, workers=DEFAULT_WORKERS, xlsx=True):
     # backward compatible: google-only list[str]
     entries = [{"google": p, "apple": ""} for p in packages]
-    parse_entries(entries)
+    parse_entries(entries, workers, xlsx)
 
 
 def to_iso_date(s: str) -> str:
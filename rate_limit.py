@@ -0,0 +1,117 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Per-host token buckets shared by every worker thread and the async pipeline.
+# The rate adapts (AIMD): halved on 429/503, creeping back up on success, and a
+# Retry-After pauses the whole host, not just the request that got it.
+
+# host suffix -> (requests per second, burst)
+HOST_RATES = {
+    "play.google.com": (10.0, 10),
+    "itunes.apple.com": (0.5, 5),   # documented limit is ~20 lookups/minute
+    "googleusercontent.com": (50.0, 50),
+    "mzstatic.com": (50.0, 50),
+}
+DEFAULT_RATE = (20.0, 20)
+MIN_RATE_FRACTION = 0.05    # never slow a host below 5% of its configured rate
+RECOVERY_FRACTION = 0.05    # each success gives back 5% of the configured rate
+
+_config = {
+    "rates": dict(HOST_RATES),
+    "default": DEFAULT_RATE,
+    "enabled": True,
+}
+_buckets = {}
+_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        if not float(rate) > 0:
+            raise ValueError(f"rate must be > 0, got {rate!r}")
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def throttled(self, retry_after: float = 0.0):
+        with self._lock:
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            if retry_after > 0:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION)
+
+
+class _Unlimited:
+    def reserve(self) -> float:
+        return 0.0
+
+    def acquire(self):
+        pass
+
+    def throttled(self, retry_after: float = 0.0):
+        pass
+
+    def succeeded(self):
+        pass
+
+
+_UNLIMITED = _Unlimited()
+
+
+def configure(rates=None, default=None, enabled=None):
+    """rates: {host suffix: (rps, burst)} merged over HOST_RATES. Resets existing buckets."""
+    with _lock:
+        if rates:
+            _config["rates"].update(rates)
+        if default is not None:
+            _config["default"] = default
+        if enabled is not None:
+            _config["enabled"] = bool(enabled)
+        _buckets.clear()
+
+
+def _rate_for(host: str):
+    best = None
+    for suffix, rate in _config["rates"].items():
+        if host == suffix or host.endswith("." + suffix):
+            if best is None or len(suffix) > len(best[0]):
+                best = (suffix, rate)
+    return best[1] if best else _config["default"]
+
+
+def for_url(url: str):
+    if not _config["enabled"]:
+        return _UNLIMITED
+    host = (urlsplit(url).hostname or "").lower()
+    bucket = _buckets.get(host)
+    if bucket is None:
+        with _lock:
+            bucket = _buckets.get(host)
+            if bucket is None:
+                bucket = _buckets[host] = TokenBucket(*_rate_for(host))
+    return bucket
@@ -1,6 +1,17 @@
-import sys
-import json
+import argparse
+import itertools
 import packages_parser
+import http_client
+import metadata_cache
+import asset_store
+import cdn_images
+import rate_limit
+import entry_loader
+import checkpoint
+import delta
+import metrics
+import apple_store_parser
+import locales
 
 
 def load_entries(file_path: str):
@@ -12,63 +23,218 @@ def load_entries(file_path: str):
          {"google":"com.y"}
        ]
        or JSON: ["com.x", "com.y"]
+    3) JSON Lines (.jsonl/.ndjson) and CSV (.csv) with the same fields
+    Duplicate ids are dropped. See iter_entries for the lazy version.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
-        raw = f.read().strip()
-
-    if not raw:
-        return []
-
-    is_json = file_path.lower().endswith(".json") or raw[:1] in ("[", "{")
-    if is_json:
-        data = json.loads(raw)
-
-        if isinstance(data, dict):
-            data = [data]
-
-        if isinstance(data, list):
-            if all(isinstance(x, str) for x in data):
-                return [{"google": x.strip(), "apple": ""} for x in data if x.strip()]
-
-            if all(isinstance(x, dict) for x in data):
-                entries = []
-                for x in data:
-                    entries.append({
-                        "google": (x.get("google") or x.get("package") or x.get("android") or "").strip(),
-                        "apple": str(x.get("apple") or x.get("trackId") or x.get("ios") or "").strip(),
-                    })
-                return entries
-
-        raise ValueError("Unsupported JSON format. Expected list[str] or list[dict].")
-
-    lines = []
-    for line in raw.splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
-            continue
-        lines.append(line)
-
-    return [{"google": x, "apple": ""} for x in lines]
+    return list(iter_entries(file_path))
+
+
+def iter_entries(file_path: str):
+    return entry_loader.dedupe(entry_loader.iter_entries(file_path))
+
+
+def parse_rate(value: str):
+    """HOST=RPS or HOST=RPS/BURST -> (host, (rps, burst))"""
+    host, sep, rate = value.partition("=")
+    if not sep or not host.strip():
+        raise argparse.ArgumentTypeError(f"expected HOST=RPS[/BURST], got {value!r}")
+    rps, _, burst = rate.partition("/")
+    try:
+        rps = float(rps)
+        burst = int(burst) if burst else max(1, int(rps))
+    except (ValueError, OverflowError):
+        raise argparse.ArgumentTypeError(f"expected HOST=RPS[/BURST], got {value!r}")
+    if not 0 < rps < float("inf") or burst < 1:
+        raise argparse.ArgumentTypeError(f"expected RPS > 0 and BURST >= 1, got {value!r}")
+    return host.strip().lower(), (rps, burst)
+
+
+def parse_shard(value: str):
+    try:
+        return checkpoint.parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_locales(value: str):
+    try:
+        return locales.parse_locales(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        usage="python runner.py <packages.txt|apps_list.json|.jsonl|.csv> [options]",
+    )
+    parser.add_argument("file_path", nargs="?")
+    parser.add_argument(
+        "--workers", type=int, default=packages_parser.DEFAULT_WORKERS,
+        help="number of entries fetched concurrently (1 = sequential)",
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=http_client.POOL_SIZE,
+        help="keep-alive connections per host (raised to --workers if lower)",
+    )
+    parser.add_argument(
+        "--retries", type=int, default=http_client.RETRIES,
+        help="retries with exponential backoff for failed/throttled requests",
+    )
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="ignore the metadata cache and refetch every app",
+    )
+    parser.add_argument(
+        "--max-age", type=float, default=None,
+        help="metadata cache TTL in seconds for all stores (default: 24h)",
+    )
+    parser.add_argument(
+        "--revalidate-assets", action="store_true",
+        help="send conditional requests for already downloaded icons/screenshots",
+    )
+    parser.add_argument(
+        "--max-asset-bytes", type=int, default=asset_store.MAX_BYTES,
+        help="size limit for a single icon/screenshot download (0 = no limit)",
+    )
+    parser.add_argument(
+        "--original-images", action="store_true",
+        help="download full-size store images instead of asking the CDNs for the size the site displays",
+    )
+    parser.add_argument(
+        "--rate-limit", type=parse_rate, action="append", default=[], metavar="HOST=RPS[/BURST]",
+        help="requests per second for a host (suffix match), e.g. itunes.apple.com=0.5/5",
+    )
+    parser.add_argument(
+        "--no-rate-limit", action="store_true",
+        help="disable per-host rate limiting (retries/backoff still apply)",
+    )
+    parser.add_argument(
+        "--no-xlsx", dest="xlsx", action="store_false",
+        help=f"skip the {packages_parser.FILE_NAME} export; only {packages_parser.DATASET_FILE} is written",
+    )
+    parser.add_argument(
+        "--xlsx-images", choices=packages_parser.XLSX_IMAGE_MODES, default="embed",
+        help="embed full images, small thumbnails, hyperlinks to the store images, or none",
+    )
+    parser.add_argument(
+        "--xlsx-streaming", action="store_true",
+        help="write the workbook in xlsxwriter constant_memory mode (bounded memory)",
+    )
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="run the asyncio pipeline (aiohttp, one event loop) instead of the thread pool",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64,
+        help="entries in flight with --async",
+    )
+    parser.add_argument(
+        "--per-host", type=int, default=16,
+        help="concurrent requests per host with --async",
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, default=None, metavar="I/N",
+        help="only process shard I of N (stable hash of the app id); outputs get a .shard-I-of-N suffix",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue an interrupted run: records already in its journal are not fetched again",
+    )
+    parser.add_argument(
+        "--merge", nargs="+", default=None, metavar="DATASET",
+        help=f"merge shard datasets into {packages_parser.DATASET_FILE} (and {packages_parser.FILE_NAME}) and exit",
+    )
+    parser.add_argument(
+        "--since-last-run", nargs="?", const=True, default=None, metavar="DATASET",
+        help=f"delta mode: compare with the previous {packages_parser.DATASET_FILE} (or DATASET), reuse "
+             f"unchanged apps' assets and write a change report ({delta.CHANGE_REPORT})",
+    )
+    parser.add_argument(
+        "--metrics", default=str(metrics.default_path("runner")), metavar="PATH",
+        help=f"where the run's timing/cache/traffic metrics are written as JSON "
+             f"(set {metrics.PROFILE_ENV}=1 to also profile the run)",
+    )
+    parser.add_argument(
+        "--play-base-url", default=None, metavar="URL",
+        help="fetch Google Play pages from this base URL instead of https://play.google.com",
+    )
+    parser.add_argument(
+        "--itunes-lookup-url", default=None, metavar="URL",
+        help=f"use this iTunes lookup endpoint instead of {apple_store_parser.ITUNES_LOOKUP_URL}",
+    )
+    parser.add_argument(
+        "--locales", type=parse_locales, default=[locales.DEFAULT_LOCALE], metavar="COUNTRY:LANG,...",
+        help="storefronts to fetch, e.g. us:en,de:de,jp:ja (default us:en); every locale "
+             "but us:en gets its own outputs (apps.de-de.jsonl, apps_content/de-de/, ...)",
+    )
+    args = parser.parse_args(argv)
+    if not args.file_path and not args.merge:
+        parser.error("file_path is required unless --merge is given")
+    if len(args.locales) > 1 and (args.merge or isinstance(args.since_last_run, str)):
+        parser.error("--merge and --since-last-run DATASET take a single locale")
+    return args
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python runner.py <packages.txt|apps_list.json>")
-        sys.exit(1)
-
-    file_path = sys.argv[1]
-    entries = load_entries(file_path)
+    args = parse_args()
+    with metrics.profiled("runner"):
+        run(args)
+    metrics.write(args.metrics)
+
+
+def run(args):
+    if args.play_base_url:
+        packages_parser.set_play_base_url(args.play_base_url)
+    if args.itunes_lookup_url:
+        apple_store_parser.set_lookup_url(args.itunes_lookup_url)
+    http_client.configure(pool_size=max(args.pool_size, args.workers), retries=args.retries)
+    rate_limit.configure(rates=dict(args.rate_limit), enabled=not args.no_rate_limit)
+    metadata_cache.configure(max_age=args.max_age, refresh=args.refresh)
+    asset_store.configure(revalidate=args.revalidate_assets, max_bytes=args.max_asset_bytes)
+    cdn_images.configure(enabled=not args.original_images)
+
+    if args.merge:
+        packages_parser.merge_shards(
+            args.merge, xlsx=args.xlsx, xlsx_images=args.xlsx_images, streaming=args.xlsx_streaming,
+            locale=args.locales[0],
+        )
+        return
 
-    if not entries:
-        print("No entries found.")
+    # locales run one after another, so images shared between storefronts are
+    # already in asset_store when the next locale asks for them
+    for locale in args.locales:
+        if len(args.locales) > 1:
+            print(f"Locale {locales.tag(locale)}")
+        # read lazily: fetching starts while the rest of a large list is still being read
+        entries = iter_entries(args.file_path)
+        first = next(entries, None)
+
+        if first is None:
+            print("No entries found.")
+            return
+        run_locale(args, itertools.chain([first], entries), locale)
+
+
+def run_locale(args, entries, locale):
+    if args.use_async:
+        import async_pipeline
+        async_pipeline.parse_entries(
+            entries, concurrency=args.concurrency, per_host=args.per_host, xlsx=args.xlsx,
+            xlsx_images=args.xlsx_images, streaming=args.xlsx_streaming,
+            shard=args.shard, resume=args.resume, since_last_run=args.since_last_run, locale=locale,
+        )
         return
 
     if hasattr(packages_parser, "parse_entries"):
-        packages_parser.parse_entries(entries)
+        packages_parser.parse_entries(
+            entries, workers=args.workers, xlsx=args.xlsx,
+            xlsx_images=args.xlsx_images, streaming=args.xlsx_streaming,
+            shard=args.shard, resume=args.resume, since_last_run=args.since_last_run, locale=locale,
+        )
         return
 
     if hasattr(packages_parser, "parse_packages"):
-        packages = [e["google"] for e in entries if e.get("google")]
+        packages = (e["google"] for e in entries if e.get("google"))
         packages_parser.parse_packages(packages)
         return
 